@@ -1,36 +1,122 @@
 import os
+import time
+import logging
 import json
-from flask import Flask, request, render_template, redirect, url_for, send_from_directory
+import hashlib
+import itertools
+import cv2
+import numpy as np
+from flask import Flask, request, render_template, redirect, url_for, send_from_directory, jsonify, g
 from werkzeug.utils import secure_filename
 from collections import defaultdict
 
 # Import core logic components
-from object_detector import ObjectDetector
+from model_manager import ModelManager
 from room_identifier import RoomIdentifier
+from room_clustering import EmbeddingCache
 from unique_object_counter import UniqueObjectCounter
 from report_generator import ReportGenerator
+from job_queue import JobQueue
+from workspace import WorkspaceManager
+from visualization_renderer import VisualizationRenderer
+from video_source import VIDEO_EXTENSIONS, KeyframeSampler, frame_name, is_video, iter_video_frames
+from logging_config import configure_logging
+from metrics import CONTENT_TYPE, MetricsRegistry
+from profiling import SamplingProfiler, StageTimer
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
 # Configuration for file uploads
-UPLOAD_FOLDER = 'uploads'
-OUTPUT_FOLDER = 'output' # This should be the same as in main.py
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max upload size
+WORKSPACE_FOLDER = 'workspaces'  # One subdirectory (uploads, visualizations, reports) per upload session
+WORKSPACE_TTL_SECONDS = 60 * 60  # Workspaces unused for this long are removed
+WORKSPACE_QUOTA_BYTES = 2 * 1024 * 1024 * 1024  # Least recently used workspaces are removed beyond this
+WORKSPACE_SWEEP_INTERVAL_SECONDS = 60
+JOB_STATE_FILE = 'job.json'
+app.config['MAX_CONTENT_LENGTH'] = 256 * 1024 * 1024  # 256 MB max request size, for walkthrough videos
+# Images are read into memory, so they keep a lower limit (all images of one upload together); only videos, which
+# are streamed to the workspace, may use the rest of MAX_CONTENT_LENGTH
+MAX_IMAGE_UPLOAD_BYTES = 16 * 1024 * 1024
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'} | VIDEO_EXTENSIONS
+DETECTION_BATCH_SIZE = 8  # Images per detector forward pass
+DETECTION_CACHE_FOLDER = 'detection_cache'
+JOB_WORKERS = 2  # Uploads processed concurrently; they share the models below
+MODEL_NAMES = ('yolov8n.pt', 'yolov8s.pt')  # Models a request can choose from; the first one is the default
+DETECTION_BACKEND = 'torch'  # 'onnx' or 'openvino' run an exported graph, usually faster on CPU-only hosts
+INFERENCE_MODE = 'adaptive'  # 'full', 'tiled' or 'adaptive' (tiles panoramas, avoids upscaling small photos)
+# Render annotated images when they are requested instead of for every upload. Lazy rendering needs the uploaded
+# originals, so every original is then written to the workspace
+LAZY_VISUALIZATION = False
+RENDER_CACHE_BYTES = 64 * 1024 * 1024  # Encoded renderings kept in memory
+THUMBNAIL_SIZES = {128, 256, 512}  # Allowed values of the ?size= parameter of visualization URLs
+# Logging is only configured when the app is run with `python app.py`; under a WSGI server (e.g. gunicorn) the
+# server's logging configuration is kept
+LOG_LEVEL = 'INFO'
+LOG_JSON = False  # One JSON object per log line, for log collectors
+# Uploads may ask for a sampling profile of their job with the 'profile' field. Off by default: any uploader could
+# otherwise make their job run under the profiler
+PROFILING_ALLOWED = False
+PROFILER_INTERVAL_SECONDS = 0.005
+ROOM_CLUSTER_THRESHOLD = 0.85  # Minimum similarity between an image and a room when uploads detect rooms
+ROOM_EMBEDDING_CACHE_ENTRIES = 50000  # Embeddings of uploaded images kept in memory (about 1 KB each)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# Metrics served on /metrics. They are kept per process: scrape every worker of a multi-process server
+metrics = MetricsRegistry(prefix="room_detection_")
+stage_latency = metrics.histogram("stage_latency_seconds", "Time spent per call of a processing stage",
+                                  ("stage",))
+request_latency = metrics.histogram("request_latency_seconds", "Time spent answering HTTP requests", ("endpoint",))
+images_processed = metrics.counter("images_processed_total", "Images and video keyframes processed by upload jobs",
+                                   ("model",))
+jobs_finished = metrics.counter("jobs_finished_total", "Upload jobs finished", ("status",))
+job_throughput = metrics.gauge("job_images_per_second", "Images per second of the last finished upload job")
+model_load_time = metrics.gauge("model_load_seconds", "Time taken to load and warm up each model", ("model",))
 
 # Initialize core logic components (can be done once for the app)
-detector = ObjectDetector()
+# Models are loaded and warmed up at import time, so the first request does not pay for it and workers forked
+# from a preloading server (e.g. gunicorn --preload) share the weights; freezing the garbage collector keeps those
+# pages shared
+models = ModelManager(MODEL_NAMES, cache_dir=DETECTION_CACHE_FOLDER, warmup_batch_size=DETECTION_BATCH_SIZE,
+                      backend=DETECTION_BACKEND, inference_mode=INFERENCE_MODE)
+models.preload(freeze_gc=True)
+for model_name, seconds in models.load_seconds.items():
+    model_load_time.set(seconds, model=model_name)
 room_identifier = RoomIdentifier()
+# Uploads that detect their rooms cluster image embeddings; embeddings are cached by content hash, so images uploaded
+# again are not embedded again
+image_room_identifier = RoomIdentifier(mode="image", threshold=ROOM_CLUSTER_THRESHOLD,
+                                       embedding_cache=EmbeddingCache(max_entries=ROOM_EMBEDDING_CACHE_ENTRIES))
 unique_counter = UniqueObjectCounter()
 report_generator = ReportGenerator()
+renderer = VisualizationRenderer(report_generator, max_bytes=RENDER_CACHE_BYTES, timer=StageTimer(stage_latency))
+job_queue = JobQueue(workers=JOB_WORKERS, on_change=lambda job: save_job_state(job))
+metrics.gauge("job_queue_depth", "Upload jobs queued or running").set_function(job_queue.pending)
+# Workspaces of queued and running jobs are marked busy on disk, so no worker process's sweeper removes them
+workspaces = WorkspaceManager(os.path.join(app.root_path, WORKSPACE_FOLDER), ttl_seconds=WORKSPACE_TTL_SECONDS,
+                              max_bytes=WORKSPACE_QUOTA_BYTES)
+workspaces.start_sweeper(WORKSPACE_SWEEP_INTERVAL_SECONDS)
+# Threads do not survive a fork, so every forked worker process starts its own sweeper
+os.register_at_fork(after_in_child=lambda: workspaces.start_sweeper(WORKSPACE_SWEEP_INTERVAL_SECONDS))
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    if 'request_start' in g:
+        request_latency.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or "unknown")
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return app.response_class(metrics.render(), content_type=CONTENT_TYPE)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -47,94 +133,342 @@ def upload_file():
 
     files = request.files.getlist('files[]')
     room_id_input = request.form.get('room_id', 'Unknown_Room')
+    keep_originals = request.form.get('keep_originals') in ('1', 'true', 'on')
+    detect_rooms = request.form.get('detect_rooms') in ('1', 'true', 'on')
+    profile = PROFILING_ALLOWED and request.values.get('profile') in ('1', 'true', 'on')
 
     if not files or all(f.filename == '' for f in files):
         return redirect(request.url)
 
-    processed_images = []
-    detections_by_room = defaultdict(list)
-    
-    # Clear previous uploads and outputs to maintain a clean state for each new upload session
-    clear_directory(app.config['UPLOAD_FOLDER'])
-    clear_directory(os.path.join(app.config['OUTPUT_FOLDER'], "visualizations"))
-    clear_directory(app.config['OUTPUT_FOLDER'], exclude_dirs=["visualizations"])
+    # The model can be chosen per request; all of them are already loaded
+    try:
+        detector = models.get(request.form.get('model'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    # Images are kept in memory (bounded by MAX_IMAGE_UPLOAD_BYTES) and decoded once by the job,
+    # instead of being saved and read back from disk for detection and again for visualization.
+    # Videos are streamed to the workspace, since OpenCV can only read them from a file.
+    uploaded = []
+    image_bytes = 0
     for file in files:
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            file.save(filepath)
-            
-            # Process the uploaded image
-            room_id = room_id_input # Using input room ID for now
-            # In a more advanced version, you'd classify the room from the image itself
+            if is_video(filename):
+                uploaded.append((filename, file))
+                continue
+            data = file.read(MAX_IMAGE_UPLOAD_BYTES - image_bytes + 1)
+            image_bytes += len(data)
+            if image_bytes > MAX_IMAGE_UPLOAD_BYTES:
+                return jsonify({"error": f"Images may total at most {MAX_IMAGE_UPLOAD_BYTES // (1024 * 1024)} MB "
+                                         "per upload"}), 413
+            uploaded.append((filename, data))
+
+    # Every upload session gets its own workspace, so concurrent users never touch each other's files
+    workspace = workspaces.create(busy=True)
+    try:
+        for index, (filename, data) in enumerate(uploaded):
+            if not isinstance(data, bytes):
+                data.save(os.path.join(workspace.upload_dir, filename))
+                uploaded[index] = (filename, None)
+    except Exception:
+        workspace.mark_idle()
+        raise
+
+    # Detection, visualization and report generation run on the job workers, not in this request
+    job = job_queue.submit(profile_upload if profile else process_upload, len(uploaded), workspace, detector, uploaded,
+                           room_id_input, keep_originals, detect_rooms, job_id=workspace.session_id)
+
+    if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+        return redirect(url_for('job_page', job_id=job.job_id))
+    return jsonify({
+        "job_id": job.job_id,
+        "status_url": url_for('job_status', job_id=job.job_id),
+        "redirect_url": url_for('job_page', job_id=job.job_id)
+    }), 202
+
+def decode_upload(data):
+    """
+    Decodes an uploaded image from its encoded bytes without going through the filesystem.
+    Args:
+        data (bytes): The encoded image (JPG, PNG, ...) as received.
+    Returns:
+        numpy.ndarray: The decoded BGR image, or None if the data is not a decodable image.
+    """
+    # np.frombuffer wraps the bytes without copying them
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def file_digest(path):
+    """
+    Returns the SHA-1 digest of a file, read in chunks.
+    Args:
+        path (str): Path of the file.
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def process_upload(job, workspace, detector, uploaded, room_id, keep_originals=False, detect_rooms=False):
+    """
+    Job worker: runs detection, visualization and report generation for one upload session.
+    Every image is decoded once and the same array feeds detection and visualization. Videos contribute their
+    keyframes (near-duplicate frames are skipped), which are batched and counted like images.
+    Args:
+        job (Job): The job being processed, used to report progress.
+        workspace (Workspace): Workspace of the upload session.
+        detector (ObjectDetector): Detector of the model chosen for the upload.
+        uploaded (list): (filename, data) tuples of the uploaded files and their encoded bytes
+                         (None for videos, which are stored in the workspace).
+        room_id (str): Room ID entered by the user for the whole batch.
+        keep_originals (bool): Also store the uploaded files in the workspace. Always done with LAZY_VISUALIZATION,
+                               where they are the source of the visualizations rendered on request.
+        detect_rooms (bool): Ignore room_id and group the images into rooms by clustering their embeddings.
+    Returns:
+        dict: The model used, processed images, unique counts, report paths relative to the workspace and the time
+              spent in every stage.
+    """
+    processed_images = []
+    detections_by_room = defaultdict(list)
+    timer = StageTimer(stage_latency)
+    start = time.perf_counter()
+
+    room_embeddings = []
+
+    def iter_images():
+        # Yields (name, image, is_video_frame, embedding cache key) for every uploaded image and every keyframe of
+        # uploaded videos. The keys hash the uploaded content and are only computed when rooms are detected
+        for filename, data in uploaded:
+            if data is None:
+                # Videos were stored in the workspace at upload time; their keyframes are streamed from there
+                video_path = os.path.join(workspace.upload_dir, filename)
+                video_digest = file_digest(video_path) if detect_rooms else None
+                frames = iter_video_frames(video_path, KeyframeSampler())
+                for frame_index, frame in timer.iterate("decode", frames):
+                    yield (frame_name(filename, frame_index), frame, True,
+                           f"{video_digest}@{frame_index}" if detect_rooms else None)
+            else:
+                if keep_originals or LAZY_VISUALIZATION:
+                    with open(os.path.join(workspace.upload_dir, filename), 'wb') as f:
+                        f.write(data)
+                with timer.stage("decode"):
+                    image = decode_upload(data)
+                if image is None:
+                    logger.error("Could not decode uploaded image %s", filename)
+                else:
+                    yield filename, image, False, hashlib.sha1(data).hexdigest() if detect_rooms else None
+            job.advance()
+
+    images = iter_images()
+    while True:
+        chunk = list(itertools.islice(images, DETECTION_BATCH_SIZE))
+        if not chunk:
+            break
 
-            detections = detector.detect_objects(filepath)
-            detections_by_room[room_id].extend(detections)
+        # Run detection over the uploaded images in batches
+        with timer.stage("inference", count=len(chunk)):
+            batch_detections = detector.detect_batch([image for _, image, _, _ in chunk],
+                                                     batch_size=DETECTION_BATCH_SIZE)
 
-            # Visualize and save detections for this image
-            output_visualization_path = os.path.join(app.config['OUTPUT_FOLDER'], "visualizations", f"detected_{filename}")
-            report_generator.visualize_detections(filepath, detections, output_visualization_path)
+        for (filename, image, is_frame, key), detections in zip(chunk, batch_detections):
+            if detect_rooms:
+                # Rooms are assigned once every image is embedded
+                with timer.stage("embed"):
+                    room_embeddings.append(image_room_identifier.embed(image, detections, key))
+            else:
+                detections_by_room[room_id].extend(detections)
+
+            # Visualize and save detections for this image, unless it is rendered when requested
+            # (video frames have no stored original to render from, so they are always drawn now)
+            visualization_name = f"detected_{filename}.jpg" if is_frame else f"detected_{filename}"
+            if is_frame or not LAZY_VISUALIZATION:
+                output_visualization_path = os.path.join(workspace.visualization_dir, visualization_name)
+                with timer.stage("draw"):
+                    annotated = report_generator.draw_detections(image.copy(), detections)
+                with timer.stage("encode"):
+                    cv2.imwrite(output_visualization_path, annotated)
 
             processed_images.append({
                 "filename": filename,
                 "room_id": room_id,
-                "detections": detections,
-                "visualization_url": url_for('uploaded_file', filename=f"visualizations/detected_{filename}")
+                "detections": list(detections),
+                "visualization": f"visualizations/{visualization_name}"
             })
 
+    if detect_rooms:
+        with timer.stage("cluster", count=len(room_embeddings)):
+            room_ids = image_room_identifier.assign_rooms(room_embeddings)
+        for image, image_room_id in zip(processed_images, room_ids):
+            image["room_id"] = image_room_id
+            detections_by_room[image_room_id].extend(image["detections"])
+
     # Generate reports after processing all images
-    unique_counts = unique_counter.count_unique_objects(detections_by_room)
-    json_report_path = os.path.join(app.config['OUTPUT_FOLDER'], "room_wise_report.json")
-    csv_report_path = os.path.join(app.config['OUTPUT_FOLDER'], "room_wise_report.csv")
-    report_generator.generate_json_report(unique_counts, json_report_path)
-    report_generator.generate_csv_report(unique_counts, csv_report_path)
+    with timer.stage("report"):
+        unique_counts = unique_counter.count_unique_objects(detections_by_room)
+        report_generator.generate_json_report(unique_counts,
+                                              os.path.join(workspace.report_dir, "room_wise_report.json"))
+        report_generator.generate_csv_report(unique_counts, os.path.join(workspace.report_dir, "room_wise_report.csv"))
 
-    # Prepare data for rendering results
-    results_data = {
+    elapsed = time.perf_counter() - start
+    images_processed.inc(len(processed_images), model=detector.model_name)
+    if processed_images:
+        job_throughput.set(len(processed_images) / elapsed)
+    logger.info("Job %s: %d image(s) in %.2fs", job.job_id, len(processed_images), elapsed)
+
+    return {
+        "model": detector.model_name,
         "processed_images": processed_images,
         "unique_counts": unique_counts,
-        "json_report_url": url_for('uploaded_file', filename='room_wise_report.json'),
-        "csv_report_url": url_for('uploaded_file', filename='room_wise_report.csv')
+        "json_report": "reports/room_wise_report.json",
+        "csv_report": "reports/room_wise_report.csv",
+        "timings": timer.report()
     }
 
+def profile_upload(job, workspace, *args):
+    """
+    Job worker: runs process_upload under the sampling profiler, for uploads that asked for a profile.
+    The samples are saved as collapsed stacks (the input of flame graph tools) in the workspace.
+    Args:
+        job (Job): The job being processed.
+        workspace (Workspace): Workspace of the upload session.
+        *args: The other arguments of process_upload.
+    Returns:
+        dict: The result of process_upload, plus the path of the profile and its most sampled functions.
+    """
+    with SamplingProfiler(PROFILER_INTERVAL_SECONDS) as profiler:
+        result = process_upload(job, workspace, *args)
+    with open(os.path.join(workspace.report_dir, "profile.txt"), 'w') as f:
+        f.write(profiler.collapsed())
+    return dict(result, profile="reports/profile.txt", profile_top=profiler.top(10))
+
+def save_job_state(job):
+    """
+    Publishes the state (and, once done, the result) of a job to its workspace, so that every worker process
+    can answer status and result requests. Finished jobs are then dropped from memory.
+    Args:
+        job (Job): The job whose state changed.
+    """
+    workspace = workspaces.get(job.job_id)
+    state_path = os.path.join(workspace.root, JOB_STATE_FILE)
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(job.to_dict(), result=job.result), f)
+    os.replace(tmp_path, state_path)
+    if job.status in ("done", "failed"):
+        workspace.mark_idle()
+        jobs_finished.inc(status=job.status)
+        job_queue.forget(job.job_id)
+
+def load_job_state(job_id):
+    """
+    Returns the state of a job, from memory if this process runs it, otherwise from its workspace.
+    Args:
+        job_id (str): The job (and session) identifier.
+    Returns:
+        dict: The job status fields plus 'result', or None if the job is unknown.
+    """
+    job = job_queue.get(job_id)
+    if job is not None:
+        return dict(job.to_dict(), result=job.result)
+    workspace = workspaces.get(job_id)
+    if workspace is None:
+        return None
+    try:
+        with open(os.path.join(workspace.root, JOB_STATE_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    state = load_job_state(job_id)
+    if state is None:
+        return jsonify({"error": "Job not found"}), 404
+    state.pop("result")
+    if state["status"] == "done":
+        state["results_url"] = url_for('job_page', job_id=job_id)
+    return jsonify(state)
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    state = load_job_state(job_id)
+    if state is None:
+        return "Job not found", 404
+    if state["status"] != "done":
+        return render_template('job_status.html', job=state)
+    workspaces.get(job_id).touch()
+
+    # Prepare data for rendering results
+    result = state["result"]
+    results_data = {
+        "processed_images": [
+            dict(image, visualization_url=url_for('uploaded_file', session_id=job_id, filename=image["visualization"]))
+            for image in result["processed_images"]
+        ],
+        "unique_counts": result["unique_counts"],
+        "json_report_url": url_for('uploaded_file', session_id=job_id, filename=result["json_report"]),
+        "csv_report_url": url_for('uploaded_file', session_id=job_id, filename=result["csv_report"]),
+        "profile_url": url_for('uploaded_file', session_id=job_id, filename=result["profile"])
+                       if "profile" in result else None
+    }
     return render_template('results.html', results=results_data)
 
-@app.route('/uploads/<path:filename>')
-def uploaded_file(filename):
-    # This route serves files from the UPLOAD_FOLDER and OUTPUT_FOLDER
-    # For simplicity, we are serving directly. In a production environment,
-    # you might want more robust file serving.
-    upload_path = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
-    output_path = os.path.join(app.root_path, app.config['OUTPUT_FOLDER'])
-    
-    if os.path.exists(os.path.join(upload_path, filename)):
-        return send_from_directory(upload_path, filename)
-    elif os.path.exists(os.path.join(output_path, filename)):
-        return send_from_directory(output_path, filename)
-    elif os.path.exists(os.path.join(output_path, "visualizations", filename)):
-        return send_from_directory(os.path.join(output_path, "visualizations"), filename)
+@app.route('/uploads/<session_id>/visualizations/<filename>')
+def visualization_file(session_id, filename):
+    workspace = workspaces.get(session_id)
+    if workspace is None:
+        return "File not found", 404
+    size = request.args.get('size', type=int)
+    if size is not None and size not in THUMBNAIL_SIZES:
+        return f"Unsupported thumbnail size, use one of {sorted(THUMBNAIL_SIZES)}", 400
+    visualization_path = os.path.join(workspace.visualization_dir, filename)
+    if os.path.exists(visualization_path):
+        # Drawn eagerly when the upload was processed (always the case for video frames, which have no stored
+        # original): served as is, or downscaled into a thumbnail without drawing the detections again
+        if size is None:
+            return send_from_directory(workspace.visualization_dir, filename)
+        source_path, detections = visualization_path, []
     else:
+        state = load_job_state(session_id)
+        image = None
+        if state is not None and state["status"] == "done":
+            image = next((image for image in state["result"]["processed_images"]
+                          if image["visualization"] == f"visualizations/{filename}"), None)
+        if image is None:
+            return "File not found", 404
+        source_path, detections = os.path.join(workspace.upload_dir, image["filename"]), image["detections"]
+    validators = renderer.validator(source_path, detections, size)
+    if validators is None:
         return "File not found", 404
 
-def clear_directory(directory_path, exclude_dirs=None):
-    if os.path.exists(directory_path):
-        for item in os.listdir(directory_path):
-            item_path = os.path.join(directory_path, item)
-            if exclude_dirs and item in exclude_dirs:
-                continue
-            if os.path.isfile(item_path):
-                os.remove(item_path)
-            elif os.path.isdir(item_path):
-                # Recursively clear subdirectories, or remove if not in exclude_dirs
-                if item not in exclude_dirs if exclude_dirs else False:
-                    import shutil
-                    shutil.rmtree(item_path)
+    # Answer conditional requests before rendering anything
+    response = app.response_class()
+    response.set_etag(validators[0])
+    response.last_modified = validators[1]
+    response.cache_control.no_cache = True
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    rendered = renderer.render(source_path, detections, size)
+    if rendered is None:
+        return "File not found", 404
+    response.set_data(rendered[0])
+    response.mimetype = rendered[1]
+    return response
+
+@app.route('/uploads/<session_id>/<path:filename>')
+def uploaded_file(session_id, filename):
+    # Files are served straight from the session's workspace; send_from_directory
+    # rejects paths outside it and answers 404 for missing files
+    workspace = workspaces.get(session_id)
+    if workspace is None:
+        return "File not found", 404
+    return send_from_directory(workspace.root, filename)
 
 if __name__ == '__main__':
-    # Ensure necessary directories exist at startup
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-    os.makedirs(os.path.join(OUTPUT_FOLDER, "visualizations"), exist_ok=True)
+    configure_logging(LOG_LEVEL, json_format=LOG_JSON)
     app.run(debug=True)
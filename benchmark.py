@@ -0,0 +1,450 @@
+import os
+import json
+import time
+import platform
+import tempfile
+import argparse
+import cv2
+import numpy as np
+from detection_result import DetectionResult
+from instance_deduplicator import InstanceDeduplicator
+from profiling import StageTimer
+from room_clustering import RoomClusterer, image_embedding
+
+def make_random_images(count, width=640, height=480, seed=0):
+    """
+    Creates random BGR images for benchmarking.
+    Args:
+        count (int): Number of images to create.
+        width (int): Width of each image.
+        height (int): Height of each image.
+        seed (int): Seed for the random generator, so runs are comparable.
+    Returns:
+        list: A list of numpy arrays of shape (height, width, 3).
+    """
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+def benchmark_batch_sizes(detector, images, batch_sizes=(1, 4, 8, 16), repeats=3):
+    """
+    Measures detect_batch throughput for several batch sizes.
+    Args:
+        detector (ObjectDetector): The detector to benchmark.
+        images (list): Images (paths or arrays) to run through the detector.
+        batch_sizes (tuple): Batch sizes to compare.
+        repeats (int): Number of timed runs per batch size; the best run is reported.
+    Returns:
+        dict: A dictionary mapping each batch size to images per second.
+    """
+    # Warm-up run so that lazy graph setup is not charged to the first batch size
+    detector.detect_batch(images[:1], batch_size=1)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            detector.detect_batch(images, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+        throughput[batch_size] = len(images) / best
+        print(f"batch_size={batch_size:>3}: {throughput[batch_size]:.2f} images/sec")
+    return throughput
+
+def benchmark_startup(model_names=('yolov8n.pt',), batch_size=1):
+    """
+    Compares startup time and first-request latency of a lazily loaded detector with a ModelManager that
+    preloads and warms up its models. The detection cache is disabled so every request runs inference.
+    Args:
+        model_names (tuple): Models to load; the first one serves the request.
+        batch_size (int): Number of images in the first request.
+    Returns:
+        dict: Seconds for 'lazy' and 'preloaded', each with 'startup' and 'first_request' times.
+    """
+    from object_detector import ObjectDetector
+    from model_manager import ModelManager
+    images = make_random_images(batch_size)
+
+    start = time.perf_counter()
+    detector = ObjectDetector(model_name=model_names[0])
+    lazy_startup = time.perf_counter() - start
+    start = time.perf_counter()
+    detector.detect_batch(images, batch_size=batch_size)
+    lazy_first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manager = ModelManager(model_names, warmup_batch_size=batch_size)
+    manager.preload()
+    preloaded_startup = time.perf_counter() - start
+    start = time.perf_counter()
+    manager.get().detect_batch(images, batch_size=batch_size)
+    preloaded_first = time.perf_counter() - start
+
+    results = {
+        "lazy": {"startup": round(lazy_startup, 4), "first_request": round(lazy_first, 4)},
+        "preloaded": {"startup": round(preloaded_startup, 4), "first_request": round(preloaded_first, 4)}
+    }
+    for mode, times in results.items():
+        print(f"{mode:>9}: startup {times['startup']:.3f}s, first request {times['first_request']:.3f}s")
+    return results
+
+def _box_iou(a, b):
+    ix = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    iy = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersection = ix * iy
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+def check_backend_parity(model_name, images, backend="onnx", conf=0.25, min_iou=0.9, max_confidence_delta=1e-5,
+                         export_dir="exported_models"):
+    """
+    Compares the detections of an exported backend with those of the default PyTorch backend.
+    A reference detection is matched when the other backend reports the same class with a box of IoU >= min_iou
+    and a confidence within max_confidence_delta.
+    Args:
+        model_name (str): YOLOv8 model to compare.
+        images (list): Images (paths or arrays) to run through both backends.
+        backend (str): Backend to compare against 'torch'.
+        conf (float): Minimum confidence used by both backends.
+        min_iou (float): Minimum box IoU for two detections to match.
+        max_confidence_delta (float): Maximum confidence difference for two detections to match.
+        export_dir (str): Directory where the exported graph is cached.
+    Returns:
+        dict: Reference and candidate detection counts, matched detections and the match rate.
+    """
+    from object_detector import ObjectDetector
+    reference = ObjectDetector(model_name, conf=conf).detect_batch(images)
+    candidate = ObjectDetector(model_name, conf=conf, backend=backend, export_dir=export_dir).detect_batch(images)
+
+    matched = reference_count = candidate_count = 0
+    for ref, cand in zip(reference, candidate):
+        reference_count += len(ref)
+        candidate_count += len(cand)
+        if len(ref) == 0 or len(cand) == 0:
+            continue
+        same = (_box_iou(ref.boxes.astype(float), cand.boxes.astype(float)) >= min_iou) \
+            & (ref.class_ids[:, None] == cand.class_ids[None, :]) \
+            & (np.abs(ref.confidences[:, None] - cand.confidences[None, :]) <= max_confidence_delta)
+        matched += int(same.any(axis=1).sum())
+
+    results = {"reference_detections": reference_count, "candidate_detections": candidate_count,
+               "matched": matched, "match_rate": round(matched / reference_count, 4) if reference_count else 1.0}
+    print(f"torch vs {backend}: {results}")
+    return results
+
+def benchmark_backends(model_name, images, backends=("torch", "onnx"), batch_size=8, repeats=3):
+    """
+    Measures detect_batch throughput of several inference backends (after a warm-up, without the cache).
+    Args:
+        model_name (str): YOLOv8 model to benchmark.
+        images (list): Images (paths or arrays) to run through each backend.
+        backends (tuple): Backends to compare.
+        batch_size (int): Images per forward pass.
+        repeats (int): Number of timed runs per backend; the best run is reported.
+    Returns:
+        dict: A dictionary mapping each backend to images per second.
+    """
+    from object_detector import ObjectDetector
+    throughput = {}
+    for backend in backends:
+        detector = ObjectDetector(model_name, backend=backend)
+        detector.warm_up(batch_size)
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            detector.detect_batch(images, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+        throughput[backend] = len(images) / best
+        print(f"{backend:>8}: {throughput[backend]:.2f} images/sec ({1000 * best / len(images):.1f} ms/image)")
+    return throughput
+
+def benchmark_inference_modes(model_name, images, modes=("full", "tiled", "adaptive"), batch_size=8):
+    """
+    Compares the inference modes of ObjectDetector: throughput against the number of detections found
+    (a recall proxy when run on real photos with the pretrained weights).
+    Args:
+        model_name (str): YOLOv8 model to benchmark.
+        images (list): Images (paths or arrays), ideally of mixed sizes including large panoramas.
+        modes (tuple): Inference modes to compare.
+        batch_size (int): Images (or tiles) per forward pass.
+    Returns:
+        dict: For each mode, images per second and total detections.
+    """
+    from object_detector import ObjectDetector
+    results = {}
+    for mode in modes:
+        detector = ObjectDetector(model_name, inference_mode=mode)
+        detector.warm_up(batch_size)
+        start = time.perf_counter()
+        detections = detector.detect_batch(images, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        results[mode] = {"images_per_second": round(len(images) / elapsed, 2),
+                         "detections": sum(len(d) for d in detections)}
+        print(f"{mode:>8}: {results[mode]}")
+    return results
+
+def make_synthetic_room(num_images, instances_per_image=2, objects_per_image=20, classes=10, embedding_dim=128,
+                        seed=0):
+    """
+    Simulates the detections of one room photographed num_images times. The room holds a number of true
+    object instances proportional to its number of images; every image sees objects_per_image of them with
+    jittered boxes and noisy appearance embeddings.
+    Args:
+        num_images (int): Number of images of the room.
+        instances_per_image (int): True instances added to the room per image.
+        objects_per_image (int): Detections per image.
+        classes (int): Number of object classes.
+        embedding_dim (int): Length of the appearance embeddings.
+        seed (int): Seed for the random generator.
+    Returns:
+        tuple: (images, true_instances) where images is a list of (labels, boxes, embeddings) tuples.
+    """
+    rng = np.random.default_rng(seed)
+    true_instances = max(objects_per_image, num_images * instances_per_image)
+    labels = [f"class_{i}" for i in rng.integers(0, classes, true_instances)]
+    centers = rng.uniform(0.1, 0.9, (true_instances, 2))
+    sizes = rng.uniform(0.05, 0.2, (true_instances, 2))
+    appearances = rng.random((true_instances, embedding_dim))
+
+    images = []
+    for _ in range(num_images):
+        seen = rng.choice(true_instances, objects_per_image, replace=False)
+        jitter = rng.normal(0, 0.01, (objects_per_image, 2))
+        boxes = np.hstack([centers[seen] - sizes[seen] / 2 + jitter, centers[seen] + sizes[seen] / 2 + jitter])
+        embeddings = appearances[seen] + rng.normal(0, 0.05, (objects_per_image, embedding_dim))
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        images.append(([labels[i] for i in seen], boxes.astype(np.float32), embeddings.astype(np.float32)))
+    return images, true_instances
+
+def benchmark_instance_dedup(room_sizes=(10, 100, 1000, 5000), brute_force_limit=5000):
+    """
+    Measures instance deduplication time for rooms of different sizes, with and without the grid index.
+    Args:
+        room_sizes (tuple): Number of images per simulated room.
+        brute_force_limit (int): Largest room also run without the index (the all-pairs baseline is quadratic).
+    Returns:
+        dict: For each room size, the seconds taken with the index (and without, if run), the estimated
+              instance count and the true instance count.
+    """
+    results = {}
+    for num_images in room_sizes:
+        images, true_instances = make_synthetic_room(num_images)
+        results[num_images] = {"true_instances": true_instances}
+        for use_index in (True, False):
+            if not use_index and num_images > brute_force_limit:
+                continue
+            deduplicator = InstanceDeduplicator(use_index=use_index)
+            start = time.perf_counter()
+            for labels, boxes, embeddings in images:
+                deduplicator.add_image("room", labels, boxes, embeddings)
+            elapsed = time.perf_counter() - start
+            estimated = sum(deduplicator.instance_counts()["room"].values())
+            results[num_images]["indexed" if use_index else "brute_force"] = {
+                "seconds": round(elapsed, 4), "estimated_instances": estimated}
+        print(f"{num_images:>5} images: {results[num_images]}")
+    return results
+
+def make_synthetic_room_embeddings(num_images, images_per_room=50, dim=256, noise=0.25, seed=0):
+    """
+    Simulates the room embeddings of a dataset: every room has a random unit-length prototype and its images are
+    noisy copies of it.
+    Args:
+        num_images (int): Number of images.
+        images_per_room (int): Average number of images per room.
+        dim (int): Length of the embeddings.
+        noise (float): Norm of the noise added to the prototypes, relative to their unit length.
+        seed (int): Seed for the random generator.
+    Returns:
+        tuple: (embeddings, rooms) where embeddings is an (N, dim) float32 array and rooms the true room of every
+               image.
+    """
+    rng = np.random.default_rng(seed)
+    prototypes = rng.standard_normal((max(1, num_images // images_per_room), dim))
+    prototypes /= np.linalg.norm(prototypes, axis=1, keepdims=True)
+    rooms = rng.integers(0, len(prototypes), num_images)
+    embeddings = prototypes[rooms] + rng.standard_normal((num_images, dim)) * noise / np.sqrt(dim)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype(np.float32), rooms
+
+def benchmark_room_clustering(dataset_sizes=(1000, 10000, 50000), images_per_room=50):
+    """
+    Measures the time taken to embed an image and to cluster datasets of different sizes with the LSH clusterer.
+    This is a speed benchmark, not a measure of room accuracy: the datasets are synthetic embeddings (noisy copies of
+    random room prototypes, see make_synthetic_room_embeddings), which are far better separated than the embeddings
+    of real room photos, so their purity only checks that the clusterer recovers well separated groups.
+    Args:
+        dataset_sizes (tuple): Number of images per simulated dataset.
+        images_per_room (int): Average number of images per room.
+    Returns:
+        dict: Milliseconds per embedded 640x480 image, and for each dataset size the clustering time, the true
+              and found number of rooms, and the purity on the synthetic embeddings (share of images whose cluster's
+              majority room is theirs).
+    """
+    images = make_random_images(20)
+    detections = [{"box": (10, 20, 200, 240), "confidence": 0.9, "class_name": "chair"}]
+    start = time.perf_counter()
+    for img in images:
+        image_embedding(img, detections)
+    results = {"embed_ms_per_image": round(1000 * (time.perf_counter() - start) / len(images), 3)}
+    print(f"Embedding: {results['embed_ms_per_image']} ms/image")
+    print("LSH clustering speed on synthetic embeddings (the purity is not a measure of room accuracy on real photos):")
+
+    for num_images in dataset_sizes:
+        embeddings, rooms = make_synthetic_room_embeddings(num_images, images_per_room)
+        start = time.perf_counter()
+        labels = RoomClusterer().fit(embeddings)
+        elapsed = time.perf_counter() - start
+        majority = sum(np.bincount(rooms[labels == label]).max() for label in np.unique(labels))
+        results[num_images] = {"seconds": round(elapsed, 4), "true_rooms": int(len(np.unique(rooms))),
+                               "found_rooms": int(labels.max() + 1), "purity": round(float(majority) / num_images, 4)}
+        print(f"{num_images:>6} images: {results[num_images]}")
+    return results
+
+class StubDetector:
+    """
+    Stand-in for ObjectDetector that returns deterministic pseudo-detections without running a model, so the
+    other stages of the pipeline can be benchmarked on a CPU-only machine without downloading weights.
+    Detections are derived from the image content: the same image always yields the same detections.
+    """
+    model_name = "stub"
+    cache = None
+
+    def __init__(self, objects_per_image=5, classes=10, latency=0.0):
+        """
+        Args:
+            objects_per_image (int): Maximum number of detections per image.
+            classes (int): Number of object classes.
+            latency (float): Seconds slept per image, to simulate the cost of inference.
+        """
+        self.objects_per_image = objects_per_image
+        self.latency = latency
+        self.class_names = {i: f"class_{i}" for i in range(classes)}
+
+    def _detect(self, img):
+        height, width = img.shape[:2]
+        rng = np.random.default_rng(int(img[::max(1, height // 8), ::max(1, width // 8)].sum()))
+        count = int(rng.integers(0, self.objects_per_image + 1))
+        x1, y1 = rng.uniform(0, width * 0.8, count), rng.uniform(0, height * 0.8, count)
+        x2, y2 = x1 + rng.uniform(8, width * 0.2, count), y1 + rng.uniform(8, height * 0.2, count)
+        data = np.column_stack([x1, y1, np.minimum(x2, width), np.minimum(y2, height),
+                                rng.uniform(0.25, 1.0, count), rng.integers(0, len(self.class_names), count)])
+        return DetectionResult.from_array(data, self.class_names)
+
+    def detect_batch(self, paths_or_arrays, batch_size=8):
+        """
+        Returns pseudo-detections for several images (same interface as ObjectDetector.detect_batch).
+        """
+        if self.latency:
+            time.sleep(self.latency * len(paths_or_arrays))
+        results = []
+        for item in paths_or_arrays:
+            img = cv2.imread(item) if isinstance(item, str) else item
+            results.append(DetectionResult.empty(self.class_names) if img is None else self._detect(img))
+        return results
+
+    def detect_objects(self, image_path_or_array):
+        """
+        Returns pseudo-detections for one image (same interface as ObjectDetector.detect_objects).
+        """
+        return self.detect_batch([image_path_or_array], 1)[0]
+
+def benchmark_pipeline(rooms=4, images_per_room=25, objects_per_image=5, resolutions=((640, 480),),
+                       detector=None, batch_size=8, decode_workers=4, visualize_workers=2, count_instances=False,
+                       lazy_visualization=False, seed=0):
+    """
+    Runs the full pipeline of main.py on a generated synthetic dataset and reports end-to-end throughput and
+    the time spent in every stage (metadata, decode, detect, visualize, count, spill, report).
+    Args:
+        rooms (int): Number of rooms of the synthetic dataset.
+        images_per_room (int): Number of images per room.
+        objects_per_image (int): Number of objects drawn on (and detected by the stub detector in) every image.
+        resolutions (tuple): (width, height) pairs of the synthetic images.
+        detector (ObjectDetector, optional): Detector to benchmark. Defaults to a StubDetector, which makes the
+                                             benchmark run offline and measures everything but inference.
+        batch_size (int): Images per detector forward pass.
+        decode_workers (int): Threads decoding images.
+        visualize_workers (int): Threads drawing and encoding visualizations.
+        count_instances (bool): Also run instance deduplication.
+        lazy_visualization (bool): Skip writing visualizations.
+        seed (int): Seed of the dataset generator.
+    Returns:
+        dict: The configuration, total seconds, images per second, per-stage timings and environment details.
+    """
+    import main
+    from create_dummy_images import create_synthetic_dataset
+    detector = detector or StubDetector(objects_per_image)
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as workdir:
+        dataset_dir = os.path.join(workdir, "dataset")
+        images = create_synthetic_dataset(dataset_dir, rooms, images_per_room, objects_per_image, resolutions,
+                                          seed=seed)
+        start = time.perf_counter()
+        main.main(dataset_dir, os.path.join(workdir, "output"), batch_size=batch_size, cache_dir=None,
+                  decode_workers=decode_workers, visualize_workers=visualize_workers,
+                  count_instances=count_instances, lazy_visualization=lazy_visualization,
+                  detector=detector, timer=timer)
+        elapsed = time.perf_counter() - start
+
+    results = {
+        "config": {"rooms": rooms, "images_per_room": images_per_room, "objects_per_image": objects_per_image,
+                   "resolutions": [list(r) for r in resolutions], "detector": detector.model_name,
+                   "batch_size": batch_size, "decode_workers": decode_workers,
+                   "visualize_workers": visualize_workers, "count_instances": count_instances,
+                   "lazy_visualization": lazy_visualization},
+        "images": images,
+        "seconds": round(elapsed, 4),
+        "images_per_second": round(images / elapsed, 2),
+        "stages": timer.report(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "numpy": np.__version__, "opencv": cv2.__version__}
+    }
+    print(f"pipeline: {images} images in {elapsed:.2f}s ({results['images_per_second']} images/sec)")
+    for stage, stats in results["stages"].items():
+        print(f"{stage:>12}: {stats}")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Performance benchmarks")
+    parser.add_argument("benchmark", choices=["batch", "dedup", "startup", "backends", "modes", "pipeline", "rooms"],
+                        help="Benchmark to run")
+    parser.add_argument("--backend", default="onnx", help="Exported backend compared with torch (backends benchmark)")
+    parser.add_argument("--rooms", type=int, default=4, help="Rooms of the synthetic dataset (pipeline benchmark)")
+    parser.add_argument("--images-per-room", type=int, default=25, help="Images per room (pipeline benchmark)")
+    parser.add_argument("--objects-per-image", type=int, default=5, help="Objects per image (pipeline benchmark)")
+    parser.add_argument("--resolutions", nargs="+", default=["640x480"],
+                        help="Image resolutions as WIDTHxHEIGHT (pipeline benchmark)")
+    parser.add_argument("--model", default=None,
+                        help="YOLOv8 model to run in the pipeline benchmark (default: a stub detector, no model)")
+    parser.add_argument("--json", default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.benchmark == "batch":
+        from object_detector import ObjectDetector
+        results = benchmark_batch_sizes(ObjectDetector(), make_random_images(32))
+    elif args.benchmark == "startup":
+        results = benchmark_startup()
+    elif args.benchmark == "backends":
+        images = make_random_images(32)
+        results = {"parity": check_backend_parity('yolov8n.pt', images, backend=args.backend),
+                   "throughput": benchmark_backends('yolov8n.pt', images, backends=("torch", args.backend))}
+    elif args.benchmark == "modes":
+        images = (make_random_images(8, 400, 300) + make_random_images(8) + make_random_images(4, 4000, 3000)
+                  + make_random_images(4, 6000, 1500))
+        results = benchmark_inference_modes('yolov8n.pt', images)
+    elif args.benchmark == "pipeline":
+        detector = None
+        if args.model:
+            from object_detector import ObjectDetector
+            detector = ObjectDetector(args.model, cache_dir=None)
+        results = benchmark_pipeline(args.rooms, args.images_per_room, args.objects_per_image,
+                                     [tuple(int(v) for v in r.split("x")) for r in args.resolutions],
+                                     detector=detector)
+    elif args.benchmark == "rooms":
+        results = benchmark_room_clustering()
+    else:
+        results = benchmark_instance_dedup()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"benchmark": args.benchmark, "results": results}, f, indent=4)
+        print(f"Results written to {args.json}")
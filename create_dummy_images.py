@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 import os
+import json
+import argparse
 
 def create_dummy_image(filepath, width=640, height=480, color=(255, 255, 255)):
     """
@@ -16,9 +18,72 @@ def create_dummy_image(filepath, width=640, height=480, color=(255, 255, 255)):
     cv2.imwrite(filepath, img)
     print(f"Dummy image created at: {filepath}")
 
+def create_synthetic_dataset(dataset_dir, rooms=4, images_per_room=10, objects_per_image=5,
+                             resolutions=((640, 480),), metadata_format="json", seed=0):
+    """
+    Creates a synthetic dataset for benchmarking: noisy background images with randomly placed coloured
+    rectangles standing in for objects, plus the matching metadata file.
+    Args:
+        dataset_dir (str): Directory to write the images and metadata to.
+        rooms (int): Number of rooms.
+        images_per_room (int): Number of images per room.
+        objects_per_image (int): Number of rectangles drawn on every image.
+        resolutions (tuple): (width, height) pairs; images cycle through them.
+        metadata_format (str): 'json' (metadata.json) or 'jsonl' (metadata.jsonl).
+        seed (int): Seed for the random generator, so datasets are reproducible.
+    Returns:
+        int: The number of images written.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    metadata = []
+    for room_index in range(rooms):
+        room_id = f"Room {room_index + 1}"
+        for image_index in range(images_per_room):
+            width, height = resolutions[(room_index * images_per_room + image_index) % len(resolutions)]
+            # Low-resolution noise upscaled to full size: cheap to generate, compresses like a real photo
+            img = cv2.resize(rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8),
+                             (width, height), interpolation=cv2.INTER_LINEAR)
+            for _ in range(objects_per_image):
+                w, h = rng.integers(width // 16, width // 3), rng.integers(height // 16, height // 3)
+                x, y = rng.integers(0, width - w), rng.integers(0, height - h)
+                cv2.rectangle(img, (int(x), int(y)), (int(x + w), int(y + h)), rng.integers(0, 256, 3).tolist(), -1)
+            image_name = f"room{room_index + 1:03d}_{image_index:05d}.jpg"
+            cv2.imwrite(os.path.join(dataset_dir, image_name), img)
+            metadata.append({"image_name": image_name, "room_id": room_id})
+
+    if metadata_format == "jsonl":
+        with open(os.path.join(dataset_dir, "metadata.jsonl"), 'w') as f:
+            for entry in metadata:
+                f.write(json.dumps(entry) + "\n")
+    else:
+        with open(os.path.join(dataset_dir, "metadata.json"), 'w') as f:
+            json.dump({entry["image_name"]: {"room_id": entry["room_id"]} for entry in metadata}, f, indent=4)
+    print(f"Synthetic dataset with {len(metadata)} images in {rooms} rooms created at: {dataset_dir}")
+    return len(metadata)
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create dummy images, or a synthetic benchmark dataset")
+    parser.add_argument("--output", default="sample_dataset", help="Directory to write the images to")
+    parser.add_argument("--rooms", type=int, default=None,
+                        help="Create a synthetic dataset with this many rooms (default: four blank images)")
+    parser.add_argument("--images-per-room", type=int, default=10, help="Images per room of the synthetic dataset")
+    parser.add_argument("--objects-per-image", type=int, default=5, help="Objects drawn on every synthetic image")
+    parser.add_argument("--resolutions", nargs="+", default=["640x480"],
+                        help="Image resolutions as WIDTHxHEIGHT; images cycle through them")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json", help="Metadata file format")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    if args.rooms is not None:
+        create_synthetic_dataset(args.output, rooms=args.rooms, images_per_room=args.images_per_room,
+                                 objects_per_image=args.objects_per_image,
+                                 resolutions=[tuple(int(v) for v in r.split("x")) for r in args.resolutions],
+                                 metadata_format=args.format, seed=args.seed)
+        raise SystemExit
+
     # The script is assumed to be run from the project root (C:\Users\Lakshya Dubey\Lakshya_SimplyPhi)
-    dataset_dir = "sample_dataset"
+    dataset_dir = args.output
     os.makedirs(dataset_dir, exist_ok=True)
 
     create_dummy_image(os.path.join(dataset_dir, "image1.jpg"))
@@ -0,0 +1,232 @@
+import os
+import logging
+import ast
+import shutil
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+from detection_cache import DetectionCache
+
+logger = logging.getLogger(__name__)
+
+class TorchBackend:
+    def __init__(self, model_name, iou=0.7, max_det=300):
+        """
+        Initializes the default inference backend: the PyTorch model run through ultralytics, which does its own
+        letterboxing and NMS.
+        Args:
+            model_name (str): YOLOv8 weights or model definition (e.g. 'yolov8n.pt').
+            iou (float): IoU threshold of non-maximum suppression.
+            max_det (int): Maximum number of detections per image.
+        """
+        from ultralytics import YOLO
+        self.model = YOLO(model_name)
+        self.iou = iou
+        self.max_det = max_det
+
+    @property
+    def names(self):
+        """
+        dict: Mapping from class id to class name.
+        """
+        return self.model.names
+
+    def predict(self, images, conf, imgsz):
+        """
+        Runs inference on a batch of images.
+        Args:
+            images (list): BGR images as numpy arrays.
+            conf (float): Minimum confidence for a detection to be reported.
+            imgsz (int): Inference image size.
+        Returns:
+            list: One (N, 6) float array per image laid out as [x1, y1, x2, y2, confidence, class_id].
+        """
+        outputs = self.model(images, conf=conf, imgsz=imgsz, iou=self.iou, max_det=self.max_det, verbose=False)
+        return [r.boxes.data.cpu().numpy() for r in outputs]
+
+class ExportedBackend(ABC):
+    """
+    Base class of backends running a graph exported from the ultralytics model. The graph is exported once and
+    cached on disk; letterboxing and NMS are done here, reproducing the ultralytics PyTorch path so that both
+    backends report the same detections. Subclasses load the exported graph and run it.
+    """
+    export_format = None
+
+    def __init__(self, model_name, imgsz=640, export_dir="exported_models", iou=0.7, max_det=300):
+        """
+        Initializes the backend, exporting the model on first use.
+        Args:
+            model_name (str): YOLOv8 weights or model definition to export (e.g. 'yolov8n.pt').
+            imgsz (int): Image size the graph is exported for. Inputs are letterboxed to at most this size.
+            export_dir (str): Directory where exported graphs are cached.
+            iou (float): IoU threshold of non-maximum suppression.
+            max_det (int): Maximum number of detections per image.
+        """
+        self.iou = iou
+        self.max_det = max_det
+        self.path = self.export(model_name, imgsz, export_dir)
+        self.names, self.stride = self._load(self.path)
+
+    @classmethod
+    def export(cls, model_name, imgsz, export_dir):
+        """
+        Returns the path of the exported graph of a model, exporting it if it is not cached yet.
+        The cache entry is keyed by model name, weights content (when the weights are a local file) and image size.
+        Args:
+            model_name (str): YOLOv8 weights or model definition to export.
+            imgsz (int): Image size to export for.
+            export_dir (str): Directory where exported graphs are cached.
+        Returns:
+            str: Path of the exported graph (a file or directory, depending on the format).
+        """
+        stem = os.path.splitext(os.path.basename(model_name))[0]
+        version = DetectionCache.hash_file(model_name)[:12] if os.path.isfile(model_name) else "hub"
+        target = os.path.join(export_dir, f"{stem}_{version}_{imgsz}_{cls.export_format}")
+        if os.path.exists(target):
+            return target
+
+        from ultralytics import YOLO
+        logger.info("Exporting %s to %s (done once, cached in %s)...", model_name, cls.export_format, export_dir)
+        # Dynamic axes let batches of any size and rectangular (minimally padded) inputs through the graph
+        exported = YOLO(model_name).export(format=cls.export_format, imgsz=imgsz, dynamic=True)
+        os.makedirs(export_dir, exist_ok=True)
+        shutil.move(str(exported), target)
+        return target
+
+    @abstractmethod
+    def _load(self, path):
+        """
+        Loads the exported graph.
+        Args:
+            path (str): Path returned by export.
+        Returns:
+            tuple: (names, stride) read from the metadata ultralytics stores with the graph.
+        """
+
+    @abstractmethod
+    def _run(self, batch):
+        """
+        Runs the exported graph.
+        Args:
+            batch (numpy.ndarray): (B, 3, H, W) float32 RGB input in [0, 1].
+        Returns:
+            numpy.ndarray: Raw (B, 4 + classes, anchors) predictions with boxes as (cx, cy, w, h).
+        """
+
+    def _letterbox(self, img, imgsz):
+        # Resize keeping the aspect ratio, then pad to a multiple of the stride (as ultralytics does for rect inputs)
+        height, width = img.shape[:2]
+        ratio = min(imgsz / height, imgsz / width)
+        new_width, new_height = round(width * ratio), round(height * ratio)
+        pad_x, pad_y = ((imgsz - new_width) % self.stride) / 2, ((imgsz - new_height) % self.stride) / 2
+        if (new_width, new_height) != (width, height):
+            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+        left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+        img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return img
+
+    def _postprocess(self, prediction, input_shape, image_shape, conf):
+        # prediction: (4 + classes, anchors) for one image
+        prediction = prediction.T
+        class_scores = prediction[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        confidences = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = confidences > conf
+        boxes, confidences, class_ids = prediction[keep, :4], confidences[keep], class_ids[keep]
+        if len(boxes) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+
+        # Class-aware NMS on (x, y, w, h) boxes, highest confidence first
+        xywh = np.column_stack([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, 2:]])
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(), conf, self.iou)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:self.max_det]
+        xyxy = np.column_stack([xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]])
+
+        # Map boxes back from the letterboxed input to the original image
+        height, width = image_shape
+        gain = min(input_shape[0] / height, input_shape[1] / width)
+        pad_x = round((input_shape[1] - width * gain) / 2 - 0.1)
+        pad_y = round((input_shape[0] - height * gain) / 2 - 0.1)
+        xyxy = (xyxy - [pad_x, pad_y, pad_x, pad_y]) / gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return np.column_stack([xyxy, confidences[indices], class_ids[indices]]).astype(np.float32)
+
+    def predict(self, images, conf, imgsz):
+        """
+        Runs inference on a batch of images.
+        Args:
+            images (list): BGR images as numpy arrays.
+            conf (float): Minimum confidence for a detection to be reported.
+            imgsz (int): Inference image size (at most the size the graph was exported for).
+        Returns:
+            list: One (N, 6) float array per image laid out as [x1, y1, x2, y2, confidence, class_id].
+        """
+        inputs = [self._letterbox(img, imgsz) for img in images]
+        outputs = [None] * len(images)
+        groups = {}  # Images letterboxed to the same shape share one forward pass
+        for index, img in enumerate(inputs):
+            groups.setdefault(img.shape, []).append(index)
+        for shape, indices in groups.items():
+            # BGR HWC uint8 -> RGB CHW float in [0, 1]
+            batch = np.stack([inputs[i][..., ::-1].transpose(2, 0, 1) for i in indices]).astype(np.float32) / 255.0
+            predictions = self._run(np.ascontiguousarray(batch))
+            for i, prediction in zip(indices, predictions):
+                outputs[i] = self._postprocess(prediction, shape[:2], images[i].shape[:2], conf)
+        return outputs
+
+class OnnxBackend(ExportedBackend):
+    """
+    Runs the model exported to ONNX with ONNX Runtime on the CPU. Requires the onnx and onnxruntime packages.
+    """
+    export_format = "onnx"
+
+    def _load(self, path):
+        import onnxruntime
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        return ast.literal_eval(metadata["names"]), int(ast.literal_eval(metadata["stride"]))
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+class OpenVinoBackend(ExportedBackend):
+    """
+    Runs the model exported to OpenVINO IR on the CPU. Requires the openvino package.
+    """
+    export_format = "openvino"
+
+    def _load(self, path):
+        import yaml
+        import openvino
+        xml_path = next(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".xml"))
+        self.compiled = openvino.Core().compile_model(xml_path, "CPU")
+        with open(os.path.join(path, "metadata.yaml"), 'r') as f:
+            metadata = yaml.safe_load(f)
+        return metadata["names"], int(metadata["stride"])
+
+    def _run(self, batch):
+        return self.compiled(batch)[self.compiled.output(0)]
+
+BACKENDS = {"torch": TorchBackend, "onnx": OnnxBackend, "openvino": OpenVinoBackend}
+
+def create_backend(backend, model_name, imgsz=640, export_dir="exported_models"):
+    """
+    Creates an inference backend by name.
+    Args:
+        backend (str): One of BACKENDS ('torch', 'onnx' or 'openvino').
+        model_name (str): YOLOv8 weights or model definition (e.g. 'yolov8n.pt').
+        imgsz (int): Inference image size (exported backends export for this size).
+        export_dir (str): Directory where exported graphs are cached.
+    Returns:
+        TorchBackend | ExportedBackend: The backend.
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Available backends: {', '.join(BACKENDS)}")
+    if backend == "torch":
+        return TorchBackend(model_name)
+    return BACKENDS[backend](model_name, imgsz=imgsz, export_dir=export_dir)
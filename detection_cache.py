@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from detection_result import DetectionResult
+
+class DetectionCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        """
+        Initializes a persistent, content-addressed detection cache.
+        Entries are stored as compressed .npz files and evicted least-recently-used first
+        once the total size of the cache exceeds max_bytes.
+        Args:
+            cache_dir (str): Directory in which cache entries are stored.
+            max_bytes (int): Maximum total size of the cache on disk, in bytes.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        existing = []
+        for filename in os.listdir(cache_dir):
+            if filename.endswith('.npz'):
+                stat = os.stat(os.path.join(cache_dir, filename))
+                existing.append((stat.st_mtime, filename[:-len('.npz')], stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """
+        Computes the content hash of an image file.
+        Args:
+            path (str): Path to the file.
+            chunk_size (int): Number of bytes read at a time.
+        Returns:
+            str: Hex digest of the file contents.
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_array(image):
+        """
+        Computes the content hash of a decoded image.
+        Args:
+            image (numpy.ndarray): The image.
+        Returns:
+            str: Hex digest of the image shape and pixels.
+        """
+        digest = hashlib.sha256(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(content_hash, model_name, params):
+        """
+        Builds the cache key for an image processed by a given model configuration.
+        Args:
+            content_hash (str): Content hash of the image (see hash_file and hash_array).
+            model_name (str): Name of the detection model.
+            params (dict): Inference parameters that affect the output, e.g. confidence threshold and image size.
+        Returns:
+            str: The cache key.
+        """
+        payload = json.dumps({"image": content_hash, "model": model_name, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Looks up cached detections.
+        Args:
+            key (str): Cache key from make_key.
+        Returns:
+            DetectionResult: The cached detections, or None on a cache miss.
+        """
+        try:
+            with np.load(self._path(key)) as data:
+                class_names = {int(k): v for k, v in json.loads(str(data['class_names'])).items()}
+                result = DetectionResult(data['boxes'], data['confidences'], data['class_ids'], class_names)
+            os.utime(self._path(key))
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+                self._total_bytes -= self._entries.pop(key, 0)
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        """
+        Stores detections in the cache and evicts least-recently-used entries if the cache is full.
+        Args:
+            key (str): Cache key from make_key.
+            result (DetectionResult): Detections to store.
+        """
+        class_names = result.class_names
+        if not isinstance(class_names, dict):
+            class_names = dict(enumerate(class_names))
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, boxes=result.boxes, confidences=result.confidences, class_ids=result.class_ids,
+                                class_names=json.dumps(class_names))
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        Returns cache statistics.
+        Returns:
+            dict: Hit and miss counts, number of entries and total size in bytes.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes
+            }
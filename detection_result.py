@@ -0,0 +1,119 @@
+import numpy as np
+
+class DetectionResult:
+    """
+    Columnar container for the detections of a single image.
+
+    Boxes, confidences and class ids are stored as NumPy arrays so they can be filled with one bulk
+    transfer from the model output. For backward compatibility the result also behaves like the
+    list of dictionaries returned by earlier versions of ObjectDetector.detect_objects: it supports
+    len(), iteration and indexing, each item being a dictionary with 'box', 'confidence' and 'class_name'.
+    """
+    def __init__(self, boxes, confidences, class_ids, class_names):
+        """
+        Args:
+            boxes (array-like): Bounding boxes as an (N, 4) array of [x1, y1, x2, y2] pixel coordinates.
+            confidences (array-like): Detection confidences, shape (N,).
+            class_ids (array-like): Class ids, shape (N,).
+            class_names (dict | list): Mapping from class id to class name (e.g. YOLO.names).
+        """
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        self.class_names = class_names
+
+    @classmethod
+    def from_array(cls, data, class_names):
+        """
+        Builds a result from a raw (N, 6) model output array laid out as [x1, y1, x2, y2, confidence, class_id].
+        Args:
+            data (numpy.ndarray): Raw detections for one image.
+            class_names (dict | list): Mapping from class id to class name.
+        Returns:
+            DetectionResult: The columnar detection result.
+        """
+        data = np.asarray(data)
+        if data.size == 0:
+            return cls.empty(class_names)
+        return cls(data[:, :4], data[:, -2], data[:, -1], class_names)
+
+    @classmethod
+    def empty(cls, class_names):
+        """
+        Returns a result without detections.
+        Args:
+            class_names (dict | list): Mapping from class id to class name.
+        Returns:
+            DetectionResult: An empty detection result.
+        """
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), class_names)
+
+    @classmethod
+    def concatenate(cls, results, class_names):
+        """
+        Joins several results (e.g. from multiple frames of one input) into one.
+        Args:
+            results (list): List of DetectionResult objects.
+            class_names (dict | list): Mapping from class id to class name.
+        Returns:
+            DetectionResult: A single result holding all detections.
+        """
+        if not results:
+            return cls.empty(class_names)
+        return cls(np.concatenate([r.boxes for r in results]),
+                   np.concatenate([r.confidences for r in results]),
+                   np.concatenate([r.class_ids for r in results]),
+                   class_names)
+
+    def best_per_class(self):
+        """
+        Keeps only the most confident detection of every class, e.g. to summarize the frames of a video
+        where only the presence of each object matters.
+        Returns:
+            DetectionResult: At most one detection per class.
+        """
+        order = np.argsort(-self.confidences, kind="stable")
+        _, first = np.unique(self.class_ids[order], return_index=True)
+        keep = np.sort(order[first])
+        return DetectionResult(self.boxes[keep], self.confidences[keep], self.class_ids[keep], self.class_names)
+
+    @property
+    def labels(self):
+        """
+        list: The class name of every detection, in detection order.
+        """
+        return [self.class_names[class_id] for class_id in self.class_ids.tolist()]
+
+    def to_list(self):
+        """
+        Converts the result to the list-of-dictionaries detection format.
+        Returns:
+            list: A list of dictionaries with 'box', 'confidence' and 'class_name' keys.
+        """
+        return [
+            {"box": box, "confidence": round(confidence, 2), "class_name": class_name}
+            for box, confidence, class_name in zip(self.boxes.tolist(), self.confidences.tolist(), self.labels)
+        ]
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DetectionResult(self.boxes[index], self.confidences[index], self.class_ids[index], self.class_names)
+        return {
+            "box": self.boxes[index].tolist(),
+            "confidence": round(float(self.confidences[index]), 2),
+            "class_name": self.class_names[int(self.class_ids[index])]
+        }
+
+    def __eq__(self, other):
+        if isinstance(other, DetectionResult):
+            other = other.to_list()
+        return self.to_list() == other
+
+    def __repr__(self):
+        return f"DetectionResult({self.to_list()!r})"
@@ -0,0 +1,182 @@
+from collections import defaultdict
+import cv2
+import numpy as np
+
+class _RoomInstances:
+    """
+    Known object instances of one room, with a uniform grid over normalized box coordinates
+    so that candidate matches are looked up per cell instead of compared against every instance.
+    Boxes and embeddings are kept in growable arrays so candidates can be scored in one vectorized step.
+    """
+    def __init__(self):
+        self.labels = []
+        self.observations = []
+        self.boxes = np.zeros((16, 4), dtype=np.float32)
+        self.embeddings = None
+        self.grid = defaultdict(list)  # (class name, cell x, cell y) -> instance ids
+
+    def add(self, label, box, embedding):
+        index = len(self.labels)
+        if index == len(self.boxes):
+            self.boxes = np.concatenate([self.boxes, np.zeros_like(self.boxes)])
+            if self.embeddings is not None:
+                self.embeddings = np.concatenate([self.embeddings, np.zeros_like(self.embeddings)])
+        if embedding is not None and self.embeddings is None:
+            self.embeddings = np.zeros((len(self.boxes), len(embedding)), dtype=np.float32)
+        self.boxes[index] = box
+        if embedding is not None:
+            self.embeddings[index] = embedding
+        self.labels.append(label)
+        self.observations.append(1)
+        return index
+
+class InstanceDeduplicator:
+    def __init__(self, cell_size=0.125, match_threshold=0.6, geometry_weight=0.5, use_index=True, box_smoothing=0.5):
+        """
+        Initializes the InstanceDeduplicator, which estimates how many distinct instances of each class a room
+        contains by matching detections across the room's images.
+        A detection matches a known instance of the same class when a weighted score of box overlap (IoU of
+        boxes normalized to the image size) and appearance similarity (cosine similarity of colour-histogram
+        embeddings) reaches match_threshold. Detections in the same image never match each other.
+        Args:
+            cell_size (float): Size of a grid cell in normalized image coordinates.
+            match_threshold (float): Minimum score for a detection to be merged into an existing instance.
+            geometry_weight (float): Weight of box overlap in the score; appearance gets the remainder.
+                                     Without embeddings only box overlap is used.
+            use_index (bool): Look candidates up in the grid index. If False, every instance of the class is
+                              compared (quadratic; kept for benchmarking).
+            box_smoothing (float): Weight of a matched detection's box in the instance's box (an exponential
+                                   moving average), so an instance follows an object seen from a drifting camera
+                                   instead of keeping the box it was first seen with.
+        """
+        self.cell_size = cell_size
+        self.match_threshold = match_threshold
+        self.geometry_weight = geometry_weight
+        self.use_index = use_index
+        self.box_smoothing = box_smoothing
+        self._rooms = {}
+
+    @staticmethod
+    def embed(image, box, bins=(8, 4, 4)):
+        """
+        Computes a compact appearance embedding of a detected object: an L2-normalized HSV colour histogram.
+        Args:
+            image (numpy.ndarray): BGR image.
+            box (list): [x1, y1, x2, y2] pixel coordinates of the object.
+            bins (tuple): Number of hue, saturation and value bins.
+        Returns:
+            numpy.ndarray: The embedding, a float32 vector of length prod(bins).
+        """
+        x1, y1, x2, y2 = box
+        crop = image[max(y1, 0):max(y2, 0), max(x1, 0):max(x2, 0)]
+        if crop.size == 0:
+            return np.zeros(int(np.prod(bins)), dtype=np.float32)
+        hsv = cv2.cvtColor(cv2.resize(crop, (16, 16), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1, 2], None, list(bins), [0, 180, 0, 256, 0, 256]).flatten()
+        return hist / (np.linalg.norm(hist) or 1.0)
+
+    def extract_features(self, image, detections):
+        """
+        Computes the matching features of all detections in an image.
+        Args:
+            image (numpy.ndarray): BGR image the detections come from.
+            detections (list | DetectionResult): Detections of the image.
+        Returns:
+            tuple: (boxes, embeddings) where boxes is an (N, 4) float32 array of boxes normalized to [0, 1]
+                   and embeddings is an (N, D) float32 array.
+        """
+        height, width = image.shape[:2]
+        boxes = [det['box'] for det in detections]
+        normalized = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) / np.array([width, height, width, height],
+                                                                                   dtype=np.float32)
+        embeddings = [self.embed(image, box) for box in boxes]
+        if not embeddings:
+            # An empty box yields a zero embedding, which gives the embedding length
+            return normalized, np.zeros((0, len(self.embed(image, (0, 0, 0, 0)))), dtype=np.float32)
+        return normalized, np.asarray(embeddings, dtype=np.float32)
+
+    def _cells(self, box):
+        x1, y1, x2, y2 = np.clip(box, 0.0, 1.0)
+        first_x, last_x = int(x1 / self.cell_size), int(x2 / self.cell_size)
+        first_y, last_y = int(y1 / self.cell_size), int(y2 / self.cell_size)
+        return [(cx, cy) for cx in range(first_x, last_x + 1) for cy in range(first_y, last_y + 1)]
+
+    @staticmethod
+    def _iou(box, boxes):
+        ix = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+        iy = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+        intersection = ix * iy
+        union = (box[2] - box[0]) * (box[3] - box[1]) + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        return intersection / np.maximum(union - intersection, 1e-9)
+
+    def add_image(self, room_id, labels, boxes, embeddings=None):
+        """
+        Matches the detections of one image against the instances already seen in the room,
+        creating new instances for detections without a match.
+        Args:
+            room_id (str): Room the image belongs to.
+            labels (list): Class name of every detection.
+            boxes (numpy.ndarray): (N, 4) boxes normalized to the image size (see extract_features).
+            embeddings (numpy.ndarray, optional): (N, D) appearance embeddings (see extract_features).
+        Returns:
+            list: The instance id assigned to every detection.
+        """
+        room = self._rooms.setdefault(room_id, _RoomInstances())
+        used = set()  # Instances already taken by a detection of this image
+        assigned = []
+
+        for i, (label, box) in enumerate(zip(labels, boxes)):
+            embedding = embeddings[i] if embeddings is not None else None
+            if self.use_index:
+                candidates = {instance for cell in self._cells(box) for instance in room.grid[(label,) + cell]}
+            else:
+                candidates = {instance for instance, other in enumerate(room.labels) if other == label}
+            candidates = np.fromiter(candidates - used, dtype=np.int64)
+
+            best = None
+            if len(candidates):
+                scores = self._iou(box, room.boxes[candidates])
+                if embedding is not None and room.embeddings is not None:
+                    similarity = room.embeddings[candidates] @ embedding
+                    scores = self.geometry_weight * scores + (1.0 - self.geometry_weight) * similarity
+                top = int(np.argmax(scores))
+                if scores[top] >= self.match_threshold:
+                    best = int(candidates[top])
+
+            if best is None:
+                best = room.add(label, box, embedding)
+                for cell in self._cells(box):
+                    room.grid[(label,) + cell].append(best)
+            else:
+                # Move the box towards the new observation and re-index it where it now lies
+                old_cells = set(self._cells(room.boxes[best]))
+                room.boxes[best] += self.box_smoothing * (box - room.boxes[best])
+                new_cells = set(self._cells(room.boxes[best]))
+                for cell in old_cells - new_cells:
+                    room.grid[(label,) + cell].remove(best)
+                for cell in new_cells - old_cells:
+                    room.grid[(label,) + cell].append(best)
+                # Keep a running mean of the appearance so the instance adapts to new viewpoints
+                count = room.observations[best]
+                if embedding is not None and room.embeddings is not None:
+                    mean = (room.embeddings[best] * count + embedding) / (count + 1)
+                    room.embeddings[best] = mean / (np.linalg.norm(mean) or 1.0)
+                room.observations[best] = count + 1
+            used.add(best)
+            assigned.append(best)
+        return assigned
+
+    def instance_counts(self):
+        """
+        Returns the estimated number of distinct instances of each class per room.
+        Returns:
+            dict: A dictionary where keys are room IDs and values are dictionaries of instance counts.
+                  Example: {'Room A': {'chair': 2, 'tv': 1}}
+        """
+        counts = {}
+        for room_id, room in self._rooms.items():
+            room_counts = defaultdict(int)
+            for label in room.labels:
+                room_counts[label] += 1
+            counts[room_id] = dict(room_counts)
+        return counts
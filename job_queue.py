@@ -0,0 +1,138 @@
+import time
+import logging
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    def __init__(self, job_id, total, on_change=None):
+        """
+        Initializes a Job, the unit of work tracked by the JobQueue.
+        Args:
+            job_id (str): Unique job identifier.
+            total (int): Number of items (e.g. images) the job will process, used for progress reporting.
+            on_change (callable, optional): Called with the job whenever its status or progress changes.
+        """
+        self.on_change = on_change
+        self.job_id = job_id
+        self.status = "queued"  # queued -> running -> done | failed
+        self.processed = 0
+        self.total = total
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def advance(self, count=1):
+        """
+        Records progress of a running job.
+        Args:
+            count (int): Number of items that were just processed.
+        """
+        self.processed = min(self.processed + count, self.total)
+        self.notify()
+
+    def notify(self):
+        """
+        Calls the on_change callback, if any. Errors in the callback never affect the job itself.
+        """
+        if self.on_change is not None:
+            try:
+                self.on_change(self)
+            except Exception as e:
+                logger.error("Could not publish the state of job %s: %s", self.job_id, e)
+
+    def to_dict(self):
+        """
+        Returns the job status in a JSON-serializable form (without the result payload).
+        Returns:
+            dict: Job ID, status, progress and error message.
+        """
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "processed": self.processed,
+            "total": self.total,
+            "progress": round(self.processed / self.total, 3) if self.total else 1.0,
+            "error": self.error
+        }
+
+class JobQueue:
+    def __init__(self, workers=2, on_change=None):
+        """
+        Initializes an in-process job queue served by a local pool of worker threads.
+        Workers run in the same process, so jobs share already-loaded resources such as the global detector.
+        Args:
+            workers (int): Number of jobs processed concurrently.
+            on_change (callable, optional): Called with a job whenever its status or progress changes,
+                                            e.g. to publish the state to other processes.
+        """
+        self.on_change = on_change
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, total, *args, job_id=None):
+        """
+        Enqueues a job. The function is called as fn(job, *args) on a worker thread and its return value
+        becomes the job result.
+        Args:
+            fn (callable): The work to run.
+            total (int): Number of items the job will process.
+            *args: Extra arguments for fn.
+            job_id (str, optional): Identifier to use for the job. A random one is generated if omitted.
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(job_id or uuid.uuid4().hex, total, on_change=self.on_change)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.notify()
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = "running"
+        job.notify()
+        try:
+            job.result = fn(job, *args)
+            job.processed = job.total
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            logger.exception("Job %s failed: %s", job.job_id, e)
+        finally:
+            job.finished_at = time.time()
+            job.notify()
+
+    def get(self, job_id):
+        """
+        Looks up a job.
+        Args:
+            job_id (str): The job identifier.
+        Returns:
+            Job: The job, or None if it is unknown.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        """
+        Drops a finished job from memory.
+        Args:
+            job_id (str): The job identifier.
+        """
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def pending(self):
+        """
+        Returns the number of jobs that are queued or running.
+        Returns:
+            int: The number of unfinished jobs.
+        """
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
@@ -1,23 +1,93 @@
 import os
+import glob
 import json
-from collections import defaultdict
+import shutil
+import logging
+import argparse
 from object_detector import ObjectDetector
-from room_identifier import RoomIdentifier
+from manifest import Manifest
+from pipeline import Pipeline
+from instance_deduplicator import InstanceDeduplicator
+from metadata_stream import find_metadata, iter_metadata
+from video_source import KeyframeSampler, frame_name, is_video, iter_video_frames
+from detection_result import DetectionResult
+from profiling import StageTimer
+from room_identifier import ROOM_MODES, RoomIdentifier
+from room_clustering import EmbeddingCache
 from unique_object_counter import UniqueObjectCounter
 from report_generator import ReportGenerator
+from report_sinks import SINKS, create_sink
+from logging_config import configure_logging
 
-def main(dataset_path="Lakshya_SimplyPhi/sample_dataset", output_dir="Lakshya_SimplyPhi/output"):
+logger = logging.getLogger(__name__)
+
+ROOM_EMBEDDING_CACHE_ENTRIES = 200000  # Embeddings kept in cache_dir/room_embeddings.npz (about 1 KB each)
+
+def main(dataset_path="Lakshya_SimplyPhi/sample_dataset", output_dir="Lakshya_SimplyPhi/output", batch_size=8,
+         cache_dir="detection_cache", incremental=False, decode_workers=4, visualize_workers=2, queue_size=16,
+         count_instances=False, lazy_visualization=False, model_name='yolov8n.pt',
+         backend='torch', inference_mode='full', video_frame_step=1, keyframe_distance=10, detector=None, timer=None,
+         sinks=(), room_mode='metadata', room_threshold=0.85):
     """
     Main function to run the room-wise unique object detection pipeline.
     Args:
-        dataset_path (str): Path to the directory containing images and metadata.json.
-        output_dir (str): Directory to save reports and visualized images.
+        dataset_path (str): Path to the directory containing images and metadata.json (or metadata.jsonl,
+                            one JSON object with an 'image_name' key per line). Entries may also name walkthrough
+                            videos, whose keyframes are streamed into detection and counted for the video's room.
+        output_dir (str): Directory to save reports, visualized images and the raw per-image detections
+                          (detections.jsonl).
+        batch_size (int): Number of images sent to the detector per forward pass.
+        cache_dir (str, optional): Directory of the persistent detection cache. If None, caching is disabled.
+        incremental (bool): If True, only detect images that are new or changed since the previous incremental
+                            run (according to output_dir/manifest.json) and update the reports in place
+                            for the rooms they touch. Without a manifest, every image is detected and the
+                            reports are rebuilt. Full runs keep no manifest, so they stay lean on huge datasets.
+        decode_workers (int): Threads decoding images ahead of inference (0 decodes inline).
+        visualize_workers (int): Threads drawing and encoding visualizations (0 encodes inline).
+        queue_size (int): Maximum number of images buffered between pipeline stages.
+        count_instances (bool): If True, report the estimated number of distinct instances of each object per room
+                                (matched across images by box geometry and appearance) instead of presence only.
+                                Not supported together with incremental.
+        lazy_visualization (bool): If True, only detections are stored and no annotated images are written;
+                                   they can be rendered later from detections.jsonl with visualization_renderer.py.
+        model_name (str): YOLOv8 model to use (e.g. 'yolov8n.pt', 'yolov8s.pt').
+        backend (str): Inference backend: 'torch', or 'onnx' / 'openvino' for an exported graph on the CPU.
+        inference_mode (str): 'full' (whole image at the default size), 'tiled' (overlapping tiles merged with
+                              cross-tile NMS) or 'adaptive' (input size or tiling picked from the image dimensions).
+        video_frame_step (int): Only every video_frame_step-th video frame is considered for keyframe sampling.
+        keyframe_distance (int): Minimum dHash distance (out of 64 bits) between a video frame and the previous
+                                 keyframe for the frame to be run through the detector.
+        detector (ObjectDetector, optional): Detector to use instead of building one from the options above
+                                             (e.g. a stub detector for benchmarking the other stages).
+        timer (StageTimer, optional): Collects per-stage timings ('metadata', 'decode', 'detect', 'visualize',
+                                      'count', 'spill', 'report', 'sink', 'cluster'). A new one is created if None.
+        sinks (tuple): Report sinks also receiving every image's detections and the room counts, for querying
+                       large datasets: 'sqlite' (output/detections.sqlite), 'npz' or 'parquet' (output/columnar/).
+                       Incremental runs update the data of previous runs; other runs replace it.
+        room_mode (str): Where room IDs come from: 'metadata', 'image' (images are clustered into rooms from
+                         embeddings of their detections, colours and layout) or 'auto' (metadata where present,
+                         clustering for the rest). Clustering needs every image first, so it is not supported
+                         together with incremental or count_instances. Embeddings are cached in
+                         cache_dir/room_embeddings.npz (stale ones of the dataset are dropped after each run), from
+                         which room_clustering.py can re-cluster the dataset.
+        room_threshold (float): Minimum cosine similarity between an image and a room for it to join the room.
     """
-    print("Starting unique object detection pipeline...")
+    logger.info("Starting unique object detection pipeline...")
 
     # Initialize components
-    detector = ObjectDetector()
-    room_identifier = RoomIdentifier()
+    timer = timer or StageTimer()
+    if detector is None:
+        detector = ObjectDetector(model_name=model_name, cache_dir=cache_dir, backend=backend,
+                                  inference_mode=inference_mode)
+    if room_mode != 'metadata' and (incremental or count_instances):
+        logger.warning("Room clustering is not supported with incremental runs or instance counting. "
+                       "Using the room IDs of the metadata instead.")
+        room_mode = 'metadata'
+    embedding_cache = None
+    if room_mode != 'metadata' and cache_dir:
+        embedding_cache = EmbeddingCache(os.path.join(cache_dir, "room_embeddings.npz"),
+                                         max_entries=ROOM_EMBEDDING_CACHE_ENTRIES)
+    room_identifier = RoomIdentifier(mode=room_mode, threshold=room_threshold, embedding_cache=embedding_cache)
     unique_counter = UniqueObjectCounter()
     report_generator = ReportGenerator()
 
@@ -25,57 +95,306 @@ def main(dataset_path="Lakshya_SimplyPhi/sample_dataset", output_dir="Lakshya_Si
     os.makedirs(output_dir, exist_ok=True)
     os.makedirs(os.path.join(output_dir, "visualizations"), exist_ok=True)
 
-    # Load metadata
-    metadata_path = os.path.join(dataset_path, "metadata.json")
-    if not os.path.exists(metadata_path):
-        print(f"Error: metadata.json not found at {metadata_path}")
+    # Load metadata (streamed, so huge metadata files are never held in memory)
+    metadata_path = find_metadata(dataset_path)
+    if metadata_path is None:
+        logger.error("metadata.json not found in %s", dataset_path)
         return
-    with open(metadata_path, 'r') as f:
-        metadata = json.load(f)
-
-    all_detections_by_room = defaultdict(list)
-    all_detections_with_boxes_by_room = defaultdict(list)
-
-    # Process each image in the dataset
-    for image_name, img_metadata in metadata.items():
-        image_path = os.path.join(dataset_path, image_name)
-        print(f"\nProcessing image: {image_name}")
-
-        # 1. Room Identification
-        room_id = room_identifier.get_room_id(img_metadata)
-        if not room_id:
-            print(f"Warning: No room ID found for {image_name}. Skipping.")
-            continue
-        print(f"Identified Room ID: {room_id}")
-
-        # 2. Object Detection
-        detections = detector.detect_objects(image_path)
-        print(f"Detected objects: {[d['class_name'] for d in detections]}")
-
-        all_detections_by_room[room_id].extend(detections)
-        all_detections_with_boxes_by_room[room_id].append({
-            "image_name": image_name,
-            "image_path": image_path,
-            "detections": detections
-        })
-
-        # Optional: Visualize and save detections for each image
-        output_image_path = os.path.join(output_dir, "visualizations", f"detected_{image_name}")
-        report_generator.visualize_detections(image_path, detections, output_image_path)
-
-    # 3. Unique Object Counting
-    unique_counts = unique_counter.count_unique_objects(all_detections_by_room)
-    print("\nUnique object counts per room:", unique_counts)
-
-    # 4. Room-wise Report Generation
-    json_report_path = os.path.join(output_dir, "room_wise_report.json")
-    csv_report_path = os.path.join(output_dir, "room_wise_report.csv")
-    report_generator.generate_json_report(unique_counts, json_report_path)
-    report_generator.generate_csv_report(unique_counts, csv_report_path)
-
-    print("\nPipeline finished. Reports and visualizations are in the 'output' directory.")
+
+    # 1. Room Identification
+    def iter_entries():
+        for image_name, img_metadata in timer.iterate("metadata", iter_metadata(metadata_path)):
+            room_id = room_identifier.get_room_id(img_metadata)
+            if not room_id and not room_identifier.clusters_images:
+                logger.warning("No room ID found for %s. Skipping.", image_name)
+                continue
+            yield image_name, os.path.join(dataset_path, image_name), room_id
+
+    if incremental and count_instances:
+        logger.warning("Instance counting is not supported in incremental mode. Counting unique objects instead.")
+        count_instances = False
+
+    entries = iter_entries()
+    touched_rooms = set()
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    # Without the manifest of a previous incremental run there is nothing to update, so everything is detected and
+    # the reports and sinks are rebuilt as in a full run
+    rebuild = not incremental or not os.path.exists(manifest_path)
+    if not incremental and os.path.exists(manifest_path):
+        # This run replaces the reports the manifest describes, so it would be stale
+        os.remove(manifest_path)
+    if incremental:
+        # Only new or changed images need detection in incremental mode
+        if rebuild:
+            logger.info("No manifest of a previous incremental run in %s. Detecting every image.", output_dir)
+        manifest = Manifest(manifest_path)
+        current_names = set()
+        changed_names = set()
+
+        def iter_changed_entries(entries):
+            for image_name, image_path, room_id in entries:
+                if not os.path.exists(image_path):
+                    # Treated like an image removed from the metadata, so its recorded detections stop counting
+                    logger.warning("%s is listed in the metadata but %s does not exist. Removing it.",
+                                   image_name, image_path)
+                    continue
+                current_names.add(image_name)
+                if not manifest.is_current(image_name, image_path, room_id):
+                    changed_names.add(image_name)
+                    yield image_name, image_path, room_id
+
+        entries = iter_changed_entries(entries)
+
+    def iter_sources(entries):
+        # Videos are expanded into their keyframes, streamed without being written to disk
+        for image_name, image_path, room_id in entries:
+            if not is_video(image_name):
+                yield image_name, image_path, room_id, image_path, None
+                continue
+            sampler = KeyframeSampler(min_distance=keyframe_distance)
+            for frame_index, frame in iter_video_frames(image_path, sampler, frame_step=video_frame_step):
+                yield frame_name(image_name, frame_index), image_path, room_id, frame, image_name
+
+    # Only the per-room state needed for unique counting stays in memory (updated incrementally);
+    # raw detections are spilled to disk as they are produced
+    detections_path = os.path.join(output_dir, "detections.jsonl")
+
+    # 2. Object Detection, overlapped with decoding and visualization (one forward pass per batch of images)
+    pipeline = Pipeline(detector, report_generator, batch_size=batch_size, decode_workers=decode_workers,
+                        visualize_workers=visualize_workers, queue_size=queue_size, timer=timer)
+    def visualization_path(image_name, video_name):
+        # Video frames are always drawn now: there is no image file to render them from later
+        if lazy_visualization and not video_name:
+            return None
+        filename = f"detected_{image_name}.jpg" if video_name else f"detected_{image_name}"
+        return os.path.join(output_dir, "visualizations", filename)
+
+    pipeline_items = (
+        (source, visualization_path(image_name, video_name), image_name, room_id, image_path, video_name)
+        for image_name, image_path, room_id, source, video_name in iter_sources(entries)
+    )
+    deduplicator = InstanceDeduplicator() if count_instances else None
+    embedded_keys = set()
+    if room_identifier.clusters_images:
+        def postprocess(image, detections, item):
+            # Embeddings are cached by file, so images (and frames of videos) that did not change are not embedded
+            # again
+            image_name, image_path, video_name = item[2], item[4], item[5]
+            try:
+                key = EmbeddingCache.file_key(image_path, image_name[len(video_name):] if video_name else "")
+            except OSError:
+                key = None
+            embedded_keys.add(key)
+            return room_identifier.embed(image, detections, key=key)
+    else:
+        postprocess = deduplicator.extract_features if deduplicator is not None else None
+
+    def record(spill, image_name, image_path, room_id, detections, video_name, features=None):
+        # Counts the detections of one image for its room and writes them to the spill file and the sinks
+        with timer.stage("count"):
+            unique_counter.update(room_id, detections)
+            if deduplicator is not None and features is not None:
+                boxes, embeddings = features
+                deduplicator.add_image(room_id, detections.labels, boxes, embeddings)
+        with timer.stage("spill"):
+            spill.write(json.dumps({
+                "image_name": image_name,
+                "image_path": image_path,
+                "room_id": room_id,
+                "detections": list(detections)
+            }) + "\n")
+        if report_sinks:
+            with timer.stage("sink"):
+                for sink in report_sinks:
+                    sink.add(image_name, image_path, room_id, detections, source_name=video_name)
+
+    processed = 0
+    video_detections = {}  # video name -> (video path, room ID, summary of its keyframe detections), for the manifest
+    # When rooms are clustered from the images, detections wait in a pending spill file until every image is embedded
+    pending_path = f"{detections_path}.pending"
+    # Incremental runs spill the new detections apart and merge them with those of the unchanged images afterwards
+    new_detections_path = detections_path if rebuild else f"{detections_path}.new"
+    known_room_ids, room_embeddings = [], []
+    report_sinks = [create_sink(sink, output_dir, append=not rebuild) for sink in sinks]
+    try:
+        with open(pending_path if room_identifier.clusters_images else new_detections_path, 'w') as spill:
+            for result in pipeline.run(pipeline_items, postprocess=postprocess,
+                                       pass_item=room_identifier.clusters_images):
+                (_, _, image_name, room_id, image_path, video_name), detections = result[:2]
+                logger.debug("Processed image %s (room %s): %s", image_name, room_id, detections.labels)
+
+                processed += 1
+                if room_identifier.clusters_images:
+                    if result[2] is None:
+                        logger.warning("Could not embed %s. It is not assigned to a room.", image_name)
+                        continue
+                    known_room_ids.append(room_id)
+                    room_embeddings.append(result[2])
+                    with timer.stage("spill"):
+                        spill.write(json.dumps({
+                            "image_name": image_name,
+                            "image_path": image_path,
+                            "video_name": video_name,
+                            "detections": list(detections)
+                        }) + "\n")
+                    continue
+
+                record(spill, image_name, image_path, room_id, detections, video_name,
+                       result[2] if deduplicator is not None else None)
+                if incremental and video_name:
+                    # Only the presence of each object matters for unique counting, so one detection per class is kept
+                    if video_name in video_detections:
+                        detections = DetectionResult.concatenate([video_detections[video_name][2], detections],
+                                                                 detections.class_names)
+                    video_detections[video_name] = (image_path, room_id, detections.best_per_class())
+                elif incremental:
+                    if os.path.exists(image_path):
+                        touched_rooms.add(manifest.update(image_name, image_path, room_id, detections))
+                    else:
+                        # Deleted while the run was in progress
+                        touched_rooms.add(manifest.remove(image_name))
+                    touched_rooms.add(room_id)
+
+        if room_identifier.clusters_images:
+            # 1b. Room Identification from the images, then counting and spilling with the assigned rooms
+            with timer.stage("cluster", count=len(room_embeddings)):
+                room_ids = room_identifier.assign_rooms(room_embeddings, known_room_ids)
+            logger.info("Assigned %d image(s) to %d room(s).", len(room_ids), len(set(room_ids)))
+            with open(pending_path, 'r') as pending, open(detections_path, 'w') as spill:
+                for line, room_id in zip(pending, room_ids):
+                    entry = json.loads(line)
+                    record(spill, entry["image_name"], entry["image_path"], room_id, entry["detections"],
+                           entry["video_name"])
+            os.remove(pending_path)
+            if embedding_cache is not None:
+                # Every current file of the dataset was embedded above, so other keys under it are stale
+                embedding_cache.prune(os.path.join(os.path.abspath(dataset_path), ""), embedded_keys)
+                embedding_cache.save()
+
+        json_report_path = os.path.join(output_dir, "room_wise_report.json")
+        csv_report_path = os.path.join(output_dir, "room_wise_report.csv")
+        if incremental:
+            logger.info("Incremental run: %d new or changed image(s) or video frame(s).", processed)
+            for video_name, (video_path, room_id, summary) in video_detections.items():
+                touched_rooms.add(manifest.update(video_name, video_path, room_id, summary))
+                touched_rooms.add(room_id)
+            removed_names = [name for name in manifest.images if name not in current_names]
+            for sink in report_sinks:
+                sink.remove(removed_names)
+            for image_name in removed_names:
+                touched_rooms.add(manifest.remove(image_name))
+                stale_visualization = os.path.join(output_dir, "visualizations", f"detected_{image_name}")
+                if os.path.exists(stale_visualization):
+                    os.remove(stale_visualization)
+                for stale_frame in glob.glob(glob.escape(stale_visualization) + "@*.jpg"):
+                    os.remove(stale_frame)
+            manifest.save()
+            touched_rooms.discard(None)
+
+        if not rebuild:
+            # detections.jsonl keeps the raw detections of every image: the records of the unchanged images are
+            # carried over, those of the changed and removed ones are replaced by the new records
+            replaced = changed_names.union(removed_names)
+            merged_path = f"{detections_path}.tmp"
+            with timer.stage("spill", count=0), open(merged_path, 'w') as merged:
+                if os.path.exists(detections_path):
+                    with open(detections_path, 'r') as previous:
+                        for line in previous:
+                            name = json.loads(line)["image_name"]
+                            # Keyframes are named <video>@<frame index> and belong to their video's entry
+                            video_name = name.rpartition("@")[0]
+                            if name not in replaced and not (is_video(video_name) and video_name in replaced):
+                                merged.write(line)
+                with open(new_detections_path, 'r') as new:
+                    shutil.copyfileobj(new, merged)
+            os.replace(merged_path, detections_path)
+            os.remove(new_detections_path)
+
+        if not rebuild:
+            # 3. Unique Object Counting, only for the rooms touched by this run
+            with timer.stage("count", count=0):
+                room_detections = manifest.detections_by_room(touched_rooms)
+                unique_counts = unique_counter.count_unique_objects(room_detections)
+            logger.info("Updated unique object counts for rooms: %s", unique_counts)
+
+            # 4. Room-wise Report Generation, updating the existing reports
+            removed_rooms = {room_id for room_id in touched_rooms if room_id not in room_detections}
+            with timer.stage("sink", count=0):
+                for sink in report_sinks:
+                    sink.write_room_counts(unique_counts, removed_rooms)
+            with timer.stage("report"):
+                unique_counts = report_generator.update_json_report(unique_counts, removed_rooms, json_report_path)
+                report_generator.generate_csv_report(unique_counts, csv_report_path)
+        else:
+            # 3. Unique Object Counting (or instance counting across the images of each room)
+            with timer.stage("count", count=0):
+                unique_counts = (deduplicator.instance_counts() if deduplicator is not None
+                                 else unique_counter.snapshot())
+            logger.info("Unique object counts per room: %s", unique_counts)
+
+            # 4. Room-wise Report Generation
+            with timer.stage("sink", count=0):
+                for sink in report_sinks:
+                    sink.write_room_counts(unique_counts)
+            with timer.stage("report"):
+                report_generator.generate_json_report(unique_counts, json_report_path)
+                report_generator.generate_csv_report(unique_counts, csv_report_path)
+    finally:
+        # Buffered rows are flushed even if the pipeline fails
+        for sink in report_sinks:
+            sink.close()
+
+    if detector.cache is not None:
+        logger.info("Detection cache: %s", detector.cache.stats())
+    logger.info("Processed %d image(s). Stage timings: %s", processed, json.dumps(timer.report()))
+
+    logger.info("Pipeline finished. Reports and visualizations are in %s", output_dir)
+    if lazy_visualization:
+        logger.info("Visualizations were skipped; render them with: python visualization_renderer.py "
+                    "--detections %s --output %s", detections_path, os.path.join(output_dir, 'visualizations'))
 
 if __name__ == '__main__':
     # This part remains for command-line execution of the pipeline
     # To run the web interface, execute `python app.py`
-    main(dataset_path="sample_dataset", output_dir="output")
+    parser = argparse.ArgumentParser(description="Room-wise unique object detection pipeline")
+    parser.add_argument("--dataset", default="sample_dataset", help="Directory containing images and metadata.json")
+    parser.add_argument("--output", default="output", help="Directory for reports and visualizations")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per detector forward pass")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent detection cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process new or changed images and update the reports in place")
+    parser.add_argument("--decode-workers", type=int, default=4, help="Threads decoding images (0 = inline)")
+    parser.add_argument("--visualize-workers", type=int, default=2,
+                        help="Threads drawing and encoding visualizations (0 = inline)")
+    parser.add_argument("--queue-size", type=int, default=16, help="Images buffered between pipeline stages")
+    parser.add_argument("--count-instances", action="store_true",
+                        help="Report estimated instance counts per room instead of unique object presence")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLOv8 model to use (e.g. yolov8n.pt, yolov8s.pt)")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"],
+                        help="Inference backend (onnx/openvino export the model once and run it on the CPU)")
+    parser.add_argument("--inference-mode", default="full", choices=["full", "tiled", "adaptive"],
+                        help="Run images whole, as overlapping tiles, or pick per image from its dimensions")
+    parser.add_argument("--video-frame-step", type=int, default=1,
+                        help="Only consider every n-th frame of videos for keyframe sampling")
+    parser.add_argument("--keyframe-distance", type=int, default=10,
+                        help="Minimum perceptual-hash distance (0-64) for a video frame to be detected")
+    parser.add_argument("--lazy-visualization", action="store_true",
+                        help="Store detections only; render visualizations later with visualization_renderer.py")
+    parser.add_argument("--sink", action="append", default=[], choices=SINKS,
+                        help="Also store detections and room counts in SQLite or columnar files (repeatable)")
+    parser.add_argument("--room-mode", default="metadata", choices=ROOM_MODES,
+                        help="Take room IDs from the metadata, cluster the images into rooms, or both (auto)")
+    parser.add_argument("--room-threshold", type=float, default=0.85,
+                        help="Minimum similarity (0-1) between an image and a room when clustering")
+    parser.add_argument("--log-level", default="INFO", help="Logging level (DEBUG also logs every processed image)")
+    parser.add_argument("--log-json", action="store_true", help="Log one JSON object per line")
+    args = parser.parse_args()
+    configure_logging(args.log_level, json_format=args.log_json)
+
+    main(dataset_path=args.dataset, output_dir=args.output, batch_size=args.batch_size,
+         cache_dir=None if args.no_cache else "detection_cache", incremental=args.incremental,
+         decode_workers=args.decode_workers, visualize_workers=args.visualize_workers, queue_size=args.queue_size,
+         count_instances=args.count_instances, lazy_visualization=args.lazy_visualization,
+         model_name=args.model, backend=args.backend, inference_mode=args.inference_mode,
+         video_frame_step=args.video_frame_step, keyframe_distance=args.keyframe_distance, sinks=args.sink,
+         room_mode=args.room_mode, room_threshold=args.room_threshold)
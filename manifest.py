@@ -0,0 +1,100 @@
+import os
+import json
+from collections import defaultdict
+from detection_cache import DetectionCache
+
+class Manifest:
+    def __init__(self, manifest_path):
+        """
+        Initializes the Manifest, a record of every processed image used for incremental re-runs.
+        Each entry stores the image path, its modification time, size and content hash, its room ID
+        and its detections, so unchanged images never have to be detected again.
+        Args:
+            manifest_path (str): Path of the manifest JSON file. It is loaded if it already exists.
+        """
+        self.manifest_path = manifest_path
+        self.images = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                self.images = json.load(f).get("images", {})
+
+    def is_current(self, image_name, image_path, room_id):
+        """
+        Checks whether an image is already in the manifest with the same content and room ID.
+        The modification time and size are compared first; the content hash is only computed when they differ.
+        Args:
+            image_name (str): Name of the image in metadata.json.
+            image_path (str): Path to the image file.
+            room_id (str): Room ID of the image in the current metadata.
+        Returns:
+            bool: True if the recorded detections are still valid for this image.
+        """
+        entry = self.images.get(image_name)
+        if entry is None or entry["room_id"] != room_id or not os.path.exists(image_path):
+            return False
+        stat = os.stat(image_path)
+        if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return True
+        if entry["hash"] != DetectionCache.hash_file(image_path):
+            return False
+        # Touched but unchanged: remember the new modification time so the hash is not recomputed next run
+        entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+        return True
+
+    def update(self, image_name, image_path, room_id, detections):
+        """
+        Records the detections of a (re)processed image.
+        Args:
+            image_name (str): Name of the image in metadata.json.
+            image_path (str): Path to the image file.
+            room_id (str): Room ID of the image.
+            detections (list): Detections of the image.
+        Returns:
+            str: The room ID the image belonged to before this update, or None if it is new.
+        """
+        previous = self.images.get(image_name)
+        stat = os.stat(image_path)
+        self.images[image_name] = {
+            "path": image_path,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "hash": DetectionCache.hash_file(image_path),
+            "room_id": room_id,
+            "detections": list(detections)
+        }
+        return previous["room_id"] if previous else None
+
+    def remove(self, image_name):
+        """
+        Removes an image from the manifest.
+        Args:
+            image_name (str): Name of the image in metadata.json.
+        Returns:
+            str: The room ID of the removed image, or None if it was not in the manifest.
+        """
+        entry = self.images.pop(image_name, None)
+        return entry["room_id"] if entry else None
+
+    def detections_by_room(self, room_ids):
+        """
+        Collects the recorded detections of every image in the given rooms.
+        Args:
+            room_ids (set): Room IDs to collect.
+        Returns:
+            dict: A dictionary where keys are room IDs and values are lists of detections.
+                  Rooms without any image in the manifest are omitted.
+        """
+        detections_by_room = defaultdict(list)
+        for entry in self.images.values():
+            if entry["room_id"] in room_ids:
+                detections_by_room[entry["room_id"]].extend(entry["detections"])
+        return dict(detections_by_room)
+
+    def save(self):
+        """
+        Writes the manifest to disk atomically.
+        """
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"images": self.images}, f)
+        os.replace(tmp_path, self.manifest_path)
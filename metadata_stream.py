@@ -0,0 +1,116 @@
+import os
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+def find_metadata(dataset_path):
+    """
+    Locates the metadata file of a dataset, preferring the JSON Lines format.
+    Args:
+        dataset_path (str): Path to the dataset directory.
+    Returns:
+        str: Path of metadata.jsonl or metadata.json, or None if neither exists.
+    """
+    for filename in ("metadata.jsonl", "metadata.json"):
+        metadata_path = os.path.join(dataset_path, filename)
+        if os.path.exists(metadata_path):
+            return metadata_path
+    return None
+
+def iter_metadata(metadata_path, chunk_size=64 * 1024):
+    """
+    Streams (image_name, image_metadata) pairs from a metadata file without loading it into memory.
+    Two formats are supported:
+      - metadata.json: a single JSON object mapping image names to metadata dictionaries, parsed incrementally.
+      - metadata.jsonl: one JSON object per line, each with an 'image_name' key next to the metadata fields.
+    Args:
+        metadata_path (str): Path to the metadata file.
+        chunk_size (int): Number of characters read at a time from a .json file.
+    Yields:
+        tuple: (image_name, image_metadata) for every image, in file order.
+    """
+    if metadata_path.endswith('.jsonl'):
+        with open(metadata_path, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                img_metadata = json.loads(line)
+                image_name = img_metadata.pop("image_name", None)
+                if image_name is None:
+                    logger.warning("No image_name on line %d of %s. Skipping.", line_number, metadata_path)
+                    continue
+                yield image_name, img_metadata
+        return
+
+    with open(metadata_path, 'r') as f:
+        yield from _iter_json_object(f, chunk_size)
+
+def _iter_json_object(f, chunk_size):
+    """
+    Incrementally parses a top-level JSON object from a file, yielding its members one at a time.
+    Only the member currently being parsed (plus one read chunk) is held in memory.
+    Args:
+        f (file): Text file positioned at the start of the JSON document.
+        chunk_size (int): Number of characters read at a time.
+    Yields:
+        tuple: (key, value) for every member of the object.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        # Drops the consumed prefix and appends the next chunk; returns False at end of file
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        eof = not chunk
+        return not eof
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    def expect(token):
+        nonlocal pos
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != token:
+            raise ValueError(f"Malformed metadata: expected '{token}' at offset {pos}")
+        pos += 1
+
+    def decode():
+        # Values may be split across chunks; keep reading until a complete value has been decoded
+        nonlocal pos
+        skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    expect('{')
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == '}':
+        return
+    while True:
+        key = decode()
+        expect(':')
+        yield key, decode()
+        skip_whitespace()
+        if pos < len(buffer) and buffer[pos] == ',':
+            pos += 1
+            continue
+        expect('}')
+        return
@@ -0,0 +1,233 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+class _Metric:
+    """
+    Base class of the metrics: a value per combination of label values, updated under a lock.
+    """
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): Metric name (e.g. 'detector_images_total').
+            documentation (str): Help text shown in the exposition.
+            labelnames (tuple): Names of the labels every sample carries (e.g. ('stage',)).
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """
+        Returns the current samples of the metric.
+        Returns:
+            list: (suffix, labels, value) tuples, where labels is a dict.
+        """
+        with self._lock:
+            return [("", dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count (e.g. images processed). Rates such as images/sec are derived from it by
+    the monitoring system.
+    """
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the counter.
+        Args:
+            amount (float): Non-negative increment.
+            **labels: Label values.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down (e.g. queue depth). It can also be computed when metrics are collected.
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        """
+        Sets the gauge.
+        Args:
+            value (float): New value.
+            **labels: Label values.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments (or, with a negative amount, decrements) the gauge.
+        Args:
+            amount (float): Increment.
+            **labels: Label values.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, function):
+        """
+        Computes the gauge when metrics are collected instead of storing a value. Only for unlabelled gauges.
+        Args:
+            function (callable): Returns the current value.
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            return [("", {}, self._function())]
+        return super().samples()
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values (e.g. stage latencies in seconds) in cumulative buckets.
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Metric name (e.g. 'stage_latency_seconds').
+            documentation (str): Help text shown in the exposition.
+            labelnames (tuple): Names of the labels every sample carries.
+            buckets (tuple): Increasing upper bounds of the buckets; +Inf is added.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """
+        Records an observation.
+        Args:
+            value (float): The observed value.
+            **labels: Label values.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket (non-cumulative) counts, then the sum of observations
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Context manager observing the duration of the enclosed block, in seconds.
+        Args:
+            **labels: Label values.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", dict(labels, le=_format_value(bound)), cumulative))
+            samples.append(("_sum", labels, counts[-1]))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    def __init__(self, prefix=""):
+        """
+        Initializes the MetricsRegistry, which holds the metrics of a process and renders them in the Prometheus
+        text exposition format (served by the /metrics endpoint of the web app).
+        Args:
+            prefix (str): Prefix added to the name of every metric (e.g. 'room_detection_').
+        """
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.metric_type}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Returns the counter of that name, creating it on first use.
+        """
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        """
+        Returns the gauge of that name, creating it on first use.
+        """
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Returns the histogram of that name, creating it on first use.
+        """
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format (version 0.0.4).
+        Returns:
+            str: The exposition, to be served with CONTENT_TYPE.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
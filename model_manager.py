@@ -0,0 +1,124 @@
+import os
+import logging
+import gc
+import time
+import threading
+import weakref
+from object_detector import ObjectDetector
+from detection_cache import DetectionCache
+
+logger = logging.getLogger(__name__)
+
+# Locks held by another thread at fork time would stay locked forever in the child, so the locks of every live
+# manager are replaced after a fork. The hook is registered once; the set does not keep managers alive
+_managers = weakref.WeakSet()
+
+def _reset_locks_after_fork():
+    for manager in list(_managers):
+        manager._reset_locks()
+
+os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+class ModelManager:
+    def __init__(self, model_names=('yolov8n.pt',), default_model=None, conf=0.25, imgsz=640, cache_dir=None,
+                 cache_max_bytes=512 * 1024 * 1024, warmup_batch_size=1, backend='torch',
+                 inference_mode='full'):
+        """
+        Initializes the ModelManager, which keeps one ready-to-use ObjectDetector per configured model so that
+        requests can switch between models (e.g. yolov8n and yolov8s) without reloading weights.
+        All detectors share one detection cache; its keys include the model name.
+        Args:
+            model_names (tuple): YOLOv8 models to serve (e.g. 'yolov8n.pt', 'yolov8s.pt').
+            default_model (str, optional): Model used when a request does not name one. Defaults to the first one.
+            conf (float): Minimum confidence for a detection to be reported.
+            imgsz (int): Inference image size.
+            cache_dir (str, optional): Directory of the persistent detection cache. If None, caching is disabled.
+            cache_max_bytes (int): Maximum size of the detection cache on disk, in bytes.
+            warmup_batch_size (int): Batch size of the warm-up inference (use the batch size of real requests).
+            backend (str): Inference backend of every detector ('torch', 'onnx' or 'openvino', see ObjectDetector).
+            inference_mode (str): 'full', 'tiled' or 'adaptive' (see ObjectDetector).
+        """
+        cache = DetectionCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.cache = cache
+        self.detectors = {
+            name: ObjectDetector(model_name=name, conf=conf, imgsz=imgsz, cache=cache, backend=backend,
+                                 inference_mode=inference_mode)
+            for name in model_names
+        }
+        self.default_model = default_model or model_names[0]
+        self.warmup_batch_size = warmup_batch_size
+        self.startup_seconds = None
+        self.load_seconds = {}  # Model name -> seconds taken to load (and warm up) it in preload
+        _managers.add(self)
+
+    @property
+    def model_names(self):
+        """
+        list: Names of the served models.
+        """
+        return list(self.detectors)
+
+    def resolve(self, model_name=None):
+        """
+        Maps a requested model name to a served one. The '.pt' suffix may be omitted (e.g. 'yolov8s').
+        Args:
+            model_name (str, optional): Requested model, or None (or '') for the default model.
+        Returns:
+            str: The served model name, or None if the model is not served.
+        """
+        if not model_name:
+            return self.default_model
+        for candidate in (model_name, f"{model_name}.pt"):
+            if candidate in self.detectors:
+                return candidate
+        return None
+
+    def get(self, model_name=None):
+        """
+        Returns the detector of a model.
+        Args:
+            model_name (str, optional): Requested model (see resolve), or None for the default model.
+        Returns:
+            ObjectDetector: The detector.
+        Raises:
+            ValueError: If the model is not served.
+        """
+        name = self.resolve(model_name)
+        if name is None:
+            raise ValueError(f"Unknown model '{model_name}'. Available models: {', '.join(self.detectors)}")
+        return self.detectors[name]
+
+    def preload(self, warm_up=True, freeze_gc=False):
+        """
+        Loads every model (and runs a warm-up inference) up front instead of on the first request.
+        Call it before worker processes are forked (e.g. gunicorn --preload): the children then share the
+        loaded weights copy-on-write instead of each loading their own copy.
+        Args:
+            warm_up (bool): Also run a dummy inference per model.
+            freeze_gc (bool): Call gc.freeze() afterwards, moving every object allocated so far in the process out of
+                              the garbage collector's reach, so that collections in forked children do not write to
+                              (and thereby copy) the pages shared with the parent. It affects the whole process, so
+                              only the application about to fork its workers should ask for it.
+        Returns:
+            float: Seconds taken, also stored in startup_seconds.
+        """
+        start = time.perf_counter()
+        for name, detector in self.detectors.items():
+            model_start = time.perf_counter()
+            if warm_up:
+                detector.warm_up(self.warmup_batch_size)
+            else:
+                detector.backend
+            self.load_seconds[name] = time.perf_counter() - model_start
+            logger.info("Model %s ready in %.2fs", name, self.load_seconds[name])
+        if freeze_gc:
+            gc.freeze()
+        self.startup_seconds = time.perf_counter() - start
+        logger.info("Loaded %d model(s) in %.2fs", len(self.detectors), self.startup_seconds)
+        return self.startup_seconds
+
+    def _reset_locks(self):
+        for detector in self.detectors.values():
+            detector._lock = threading.RLock()
+        if self.cache is not None:
+            self.cache._lock = threading.Lock()
@@ -1,16 +1,86 @@
 import os
-from ultralytics import YOLO
+import logging
+import time
+import threading
 import cv2
+import numpy as np
+from detection_result import DetectionResult
+from detection_cache import DetectionCache
+from detection_backends import create_backend
+from tiling import plan_inference, merge_detections
+
+logger = logging.getLogger(__name__)
 
 class ObjectDetector:
-    def __init__(self, model_name='yolov8n.pt'):
+    def __init__(self, model_name='yolov8n.pt', conf=0.25, imgsz=640, cache_dir=None, cache_max_bytes=512 * 1024 * 1024,
+                 cache=None, backend='torch', export_dir='exported_models', inference_mode='full', tile_overlap=0.2,
+                 max_tiles=16, tile_threshold=2.0):
         """
         Initializes the ObjectDetector with a YOLOv8 model.
+        The model is loaded lazily on first inference, so runs served entirely from the cache never load it.
         Args:
             model_name (str): Name of the YOLOv8 model to use (e.g., 'yolov8n.pt', 'yolov8s.pt').
+            conf (float): Minimum confidence for a detection to be reported.
+            imgsz (int): Inference image size.
+            cache_dir (str, optional): Directory of the persistent detection cache. If None, caching is disabled.
+            cache_max_bytes (int): Maximum size of the detection cache on disk, in bytes.
+            cache (DetectionCache, optional): An existing cache to use (e.g. shared by several detectors)
+                                              instead of opening one from cache_dir.
+            backend (str): Inference backend: 'torch' (ultralytics PyTorch model), or 'onnx' / 'openvino' to run
+                           a graph exported from it on the CPU (exported once and cached in export_dir).
+            export_dir (str): Directory where exported graphs are cached.
+            inference_mode (str): 'full' runs every image whole at imgsz; 'tiled' splits images larger than imgsz
+                                  into overlapping tiles whose detections are merged with cross-tile NMS;
+                                  'adaptive' picks the input size or tiling from the image dimensions
+                                  (see tiling.plan_inference).
+            tile_overlap (float): Overlap between neighbouring tiles, as a fraction of the tile size.
+            max_tiles (int): Maximum number of tiles per image.
+            tile_threshold (float): In 'adaptive' mode, images whose longest side exceeds tile_threshold * imgsz
+                                    are tiled.
+        """
+        self.model_name = model_name
+        self.conf = conf
+        self.imgsz = imgsz
+        self.backend_name = backend
+        self.export_dir = export_dir
+        self.inference_mode = inference_mode
+        self.tiling = {"tile_overlap": tile_overlap, "max_tiles": max_tiles, "tile_threshold": tile_threshold}
+        self.cache = cache if cache is not None else (DetectionCache(cache_dir, cache_max_bytes) if cache_dir else None)
+        self._backend = None
+        # The model is not safe to call from several threads at once (e.g. concurrent web jobs)
+        self._lock = threading.RLock()
+
+    @property
+    def backend(self):
+        """
+        TorchBackend | ExportedBackend: The inference backend, loaded on first access.
+        """
+        with self._lock:
+            if self._backend is None:
+                self._backend = create_backend(self.backend_name, self.model_name, self.imgsz, self.export_dir)
+        return self._backend
+
+    @property
+    def class_names(self):
+        """
+        dict: Mapping from class id to class name.
+        """
+        return self.backend.names
+
+    def warm_up(self, batch_size=1):
         """
-        self.model = YOLO(model_name)
-        self.class_names = self.model.names
+        Loads the model and runs a dummy inference, so that one-time setup (weight loading, layer fusion,
+        memory allocation) is not paid by the first real request. The detection cache is bypassed.
+        Args:
+            batch_size (int): Number of dummy images in the warm-up batch (use the batch size of later requests).
+        Returns:
+            float: Seconds taken by loading and warming up.
+        """
+        start = time.perf_counter()
+        dummy = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        with self._lock:
+            self.backend.predict([dummy] * batch_size, self.conf, self.imgsz)
+        return time.perf_counter() - start
 
     def detect_objects(self, image_path):
         """
@@ -18,29 +88,121 @@ class ObjectDetector:
         Args:
             image_path (str): Path to the input image.
         Returns:
-            list: A list of dictionaries, where each dictionary contains 'box' (bounding box coordinates),
-                  'confidence' (detection confidence), and 'class_name' (name of the detected object).
-        """
-        if not os.path.exists(image_path):
-            print(f"Error: Image file not found at {image_path}")
-            return []
-
-        results = self.model(image_path)
-        detections = []
-
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                confidence = round(float(box.conf[0]), 2)
-                class_id = int(box.cls[0])
-                class_name = self.class_names[class_id]
-                detections.append({
-                    "box": [x1, y1, x2, y2],
-                    "confidence": confidence,
-                    "class_name": class_name
-                })
-        return detections
+            DetectionResult: Columnar detections (NumPy arrays of boxes, confidences and class ids). It also behaves
+                             like a list of dictionaries, where each dictionary contains 'box' (bounding box
+                             coordinates), 'confidence' (detection confidence), and 'class_name' (name of the
+                             detected object).
+        """
+        return self.detect_batch([image_path], batch_size=1)[0]
+
+    def detect_batch(self, paths_or_arrays, batch_size=8):
+        """
+        Detects objects in several images, running one forward pass per batch instead of one per image.
+        Images (or tiles, in the tiled inference modes) are grouped by resolution so that every batch shares a
+        single input shape.
+        Args:
+            paths_or_arrays (list): Image paths and/or BGR images as numpy arrays (as returned by cv2.imread).
+            batch_size (int): Maximum number of images per forward pass.
+        Returns:
+            list: One DetectionResult per input, in input order (same format as the output of detect_objects).
+                  Images that cannot be read yield an empty result.
+        """
+        results = [None] * len(paths_or_arrays)
+        regions = {}  # input index -> (detections of the regions done so far, number of regions, cache key)
+        pending = {}  # (region shape, input size) -> list of (input index, region, region offset)
+
+        for index, item in enumerate(paths_or_arrays):
+            key = self._cache_key(item)
+            if key is not None:
+                results[index] = self.cache.get(key)
+                if results[index] is not None:
+                    continue
+            img = self._load_image(item)
+            if img is None:
+                continue
+            input_size, boxes = plan_inference(img.shape[0], img.shape[1], self.imgsz, self.inference_mode,
+                                               **self.tiling)
+            regions[index] = ([], len(boxes), key)
+            for x1, y1, x2, y2 in boxes:
+                region = img[y1:y2, x1:x2]
+                group = (region.shape, input_size)
+                batch = pending.setdefault(group, [])
+                batch.append((index, region, (x1, y1)))
+                if len(batch) >= batch_size:
+                    self._run_batch(batch, input_size, regions, results)
+                    del pending[group]
+
+        for (_, input_size), batch in pending.items():
+            self._run_batch(batch, input_size, regions, results)
+        return [r if r is not None else DetectionResult.empty(self.class_names) for r in results]
+
+    def _run_batch(self, batch, input_size, regions, results):
+        """
+        Runs a single forward pass over a batch of image regions. Once all regions of an image are done, their
+        detections are merged and the parsed result is stored in results.
+        Args:
+            batch (list): List of (input index, region, region offset) tuples sharing the same shape.
+            input_size (int): Inference size of the batch.
+            regions (dict): Pending regions per input index, see detect_batch.
+            results (list): Output list indexed by input position.
+        """
+        with self._lock:
+            outputs = self.backend.predict([region for _, region, _ in batch], self.conf, input_size)
+        for (index, _, (x, y)), data in zip(batch, outputs):
+            if x or y:
+                # Tile coordinates -> image coordinates
+                data = data.copy()
+                data[:, [0, 2]] += x
+                data[:, [1, 3]] += y
+            parts, count, key = regions[index]
+            parts.append(data)
+            if len(parts) < count:
+                continue
+            del regions[index]
+            # One bulk array per image instead of per-box tensor accesses
+            results[index] = DetectionResult.from_array(parts[0] if count == 1 else merge_detections(parts),
+                                                        self.class_names)
+            if key is not None:
+                self.cache.put(key, results[index])
+
+    def _cache_key(self, path_or_array):
+        """
+        Computes the detection cache key for an input from its content, the model and the inference parameters.
+        Args:
+            path_or_array (str | numpy.ndarray): Image path or decoded image.
+        Returns:
+            str: The cache key, or None if caching is disabled or the file does not exist.
+        """
+        if self.cache is None:
+            return None
+        if isinstance(path_or_array, np.ndarray):
+            content_hash = DetectionCache.hash_array(path_or_array)
+        elif os.path.isfile(path_or_array):
+            content_hash = DetectionCache.hash_file(path_or_array)
+        else:
+            return None
+        return DetectionCache.make_key(content_hash, self.model_name,
+                                       {"conf": self.conf, "imgsz": self.imgsz, "backend": self.backend_name,
+                                        "inference_mode": self.inference_mode,
+                                        **(self.tiling if self.inference_mode != "full" else {})})
+
+    def _load_image(self, path_or_array):
+        """
+        Returns a BGR image for a path or passes an already decoded array through.
+        Args:
+            path_or_array (str | numpy.ndarray): Image path or decoded image.
+        Returns:
+            numpy.ndarray: The decoded image, or None if it could not be read.
+        """
+        if isinstance(path_or_array, np.ndarray):
+            return path_or_array
+        if not os.path.exists(path_or_array):
+            logger.error("Image file not found at %s", path_or_array)
+            return None
+        img = cv2.imread(path_or_array)
+        if img is None:
+            logger.error("Could not load image from %s", path_or_array)
+        return img
 
     def draw_boxes(self, image_path, detections, output_path=None):
         """
@@ -52,7 +214,7 @@ class ObjectDetector:
         """
         img = cv2.imread(image_path)
         if img is None:
-            print(f"Error: Could not load image from {image_path}")
+            logger.error("Could not load image from %s", image_path)
             return
 
         for det in detections:
@@ -66,7 +228,7 @@ class ObjectDetector:
 
         if output_path:
             cv2.imwrite(output_path, img)
-            print(f"Detection image saved to {output_path}")
+            logger.debug("Detection image saved to %s", output_path)
         else:
             cv2.imshow("Detections", img)
             cv2.waitKey(0)
@@ -0,0 +1,164 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import cv2
+import numpy as np
+from profiling import StageTimer
+
+_DONE = object()
+
+def _decode(source):
+    # Frames streamed from a video are already decoded
+    return source if isinstance(source, np.ndarray) else cv2.imread(source)
+
+class _InlineExecutor:
+    """
+    Executor that runs every task immediately on the calling thread. Used when a stage has no pool of its own.
+    """
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+class Pipeline:
+    def __init__(self, detector, report_generator, batch_size=8, decode_workers=4, visualize_workers=2, queue_size=16,
+                 timer=None):
+        """
+        Initializes a staged producer/consumer pipeline that overlaps image decoding, inference and
+        visualization encoding. Decoding and visualization run on thread pools (OpenCV releases the GIL
+        while decoding, drawing and encoding), inference runs on a single dedicated worker thread, and
+        the stages are connected by bounded queues so memory stays flat regardless of dataset size.
+        Args:
+            detector (ObjectDetector): Detector used by the inference stage.
+            report_generator (ReportGenerator): Used by the visualization stage to draw and save detections.
+            batch_size (int): Images per detector forward pass.
+            decode_workers (int): Threads decoding images. If 0, images are decoded by the thread feeding the
+                                  pipeline, without a separate pool.
+            visualize_workers (int): Threads drawing and encoding visualizations. If 0, visualizations are
+                                     written by the inference thread, without a separate pool.
+            queue_size (int): Maximum number of images buffered between two stages.
+            timer (StageTimer, optional): Collects the time spent in the 'decode', 'detect', 'visualize' and
+                                          'postprocess' stages. A new one is created if None.
+        """
+        self.detector = detector
+        self.report_generator = report_generator
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.visualize_workers = visualize_workers
+        self.queue_size = queue_size
+        self.timer = timer or StageTimer()
+
+    def run(self, items, postprocess=None, pass_item=False):
+        """
+        Runs the pipeline over a sequence of images.
+        Args:
+            items (iterable): Tuples of (image_path, visualization_path). image_path may also be an already
+                              decoded image (e.g. a video frame). visualization_path may be None to skip
+                              visualizing that image. Extra tuple elements are passed through untouched.
+            postprocess (callable, optional): Function called as postprocess(image, detections) on the
+                                              visualization pool for every decoded image, e.g. to extract features
+                                              while the decoded image is still in memory.
+            pass_item (bool): Call postprocess(image, detections, item) instead, for postprocessing that depends
+                              on the extra elements of the item (e.g. a cache key).
+        Yields:
+            tuple: (item, detections) for every input item, in input order, or (item, detections, extra) if
+                   postprocess is given, where extra is its return value (None for unreadable images).
+        """
+        decode_pool = ThreadPoolExecutor(self.decode_workers) if self.decode_workers > 0 else _InlineExecutor()
+        visualize_pool = ThreadPoolExecutor(self.visualize_workers) if self.visualize_workers > 0 else _InlineExecutor()
+        decoded = queue.Queue(maxsize=self.queue_size)
+        detected = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        decode = self.timer.wrap("decode", _decode)
+        visualize = self.timer.wrap("visualize", self.report_generator.visualize_detections)
+        if postprocess is not None:
+            postprocess = self.timer.wrap("postprocess", postprocess)
+
+        def put(q, value):
+            # Gives up if the consumer went away, so producer threads never block forever
+            while not stop.is_set():
+                try:
+                    q.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def produce():
+            try:
+                for item in items:
+                    if not put(decoded, (item, decode_pool.submit(decode, item[0]))):
+                        return
+                put(decoded, _DONE)
+            except Exception as e:
+                put(decoded, e)
+
+        def infer():
+            batch = []
+            try:
+                while True:
+                    entry = get(decoded)
+                    if entry is not _DONE and not isinstance(entry, Exception):
+                        batch.append(entry)
+                        if len(batch) < self.batch_size:
+                            continue
+                    if batch:
+                        images = [future.result() for _, future in batch]
+                        # Unreadable images fall back to their path, which the detector reports as an error
+                        with self.timer.stage("detect", count=len(batch)):
+                            detections = self.detector.detect_batch(
+                                [img if img is not None else item[0] for (item, _), img in zip(batch, images)],
+                                batch_size=self.batch_size)
+                        for (item, _), img, dets in zip(batch, images, detections):
+                            viz_future = extra_future = None
+                            if item[1] is not None and img is not None:
+                                viz_future = visualize_pool.submit(visualize, img, dets, item[1])
+                            if postprocess is not None and img is not None:
+                                extra_future = visualize_pool.submit(postprocess, img, dets,
+                                                                     *((item,) if pass_item else ()))
+                            if not put(detected, (item, dets, viz_future, extra_future)):
+                                return
+                        batch = []
+                    if entry is _DONE or isinstance(entry, Exception):
+                        put(detected, entry)
+                        return
+            except Exception as e:
+                put(detected, e)
+
+        threads = [threading.Thread(target=produce, daemon=True), threading.Thread(target=infer, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                entry = detected.get()
+                if entry is _DONE:
+                    break
+                if isinstance(entry, Exception):
+                    raise entry
+                item, dets, viz_future, extra_future = entry
+                if viz_future is not None:
+                    viz_future.result()
+                if postprocess is None:
+                    yield item, dets
+                else:
+                    yield item, dets, extra_future.result() if extra_future is not None else None
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            decode_pool.shutdown(wait=True)
+            visualize_pool.shutdown(wait=True)
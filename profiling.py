@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+class StageTimer:
+    def __init__(self, histogram=None):
+        """
+        Initializes the StageTimer, which accumulates wall-clock time and call counts per pipeline stage.
+        It is thread-safe: stages running on worker threads (decode, visualization) add up their busy time,
+        so a stage's total can exceed the run's elapsed time when it runs in parallel.
+        Args:
+            histogram (metrics.Histogram, optional): Latency histogram with a 'stage' label that also receives
+                                                     every timed call, e.g. to export it on /metrics.
+        """
+        self.histogram = histogram
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, count=1):
+        """
+        Records time spent in a stage.
+        Args:
+            stage (str): Stage name (e.g. 'decode').
+            seconds (float): Time spent.
+            count (int): Number of items processed in that time.
+        """
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += count
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage)
+
+    @contextmanager
+    def stage(self, stage, count=1):
+        """
+        Context manager timing the enclosed block as one call of a stage.
+        Args:
+            stage (str): Stage name.
+            count (int): Number of items processed by the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, count)
+
+    def wrap(self, stage, fn):
+        """
+        Returns a version of fn whose calls are timed as a stage.
+        Args:
+            stage (str): Stage name.
+            fn (callable): The function to time.
+        Returns:
+            callable: The timed function.
+        """
+        def timed(*args, **kwargs):
+            with self.stage(stage):
+                return fn(*args, **kwargs)
+        return timed
+
+    def iterate(self, stage, iterable):
+        """
+        Times the production of every item of an iterable (e.g. a streaming metadata reader) as a stage.
+        Args:
+            stage (str): Stage name.
+            iterable (iterable): The iterable to time.
+        Yields:
+            The items of iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start, 0)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def report(self):
+        """
+        Returns the accumulated timings.
+        Returns:
+            dict: For every stage, total seconds, number of items and milliseconds per item.
+                  Example: {'decode': {'seconds': 1.2, 'count': 100, 'ms_per_item': 12.0}}
+        """
+        with self._lock:
+            return {
+                stage: {"seconds": round(seconds, 6), "count": count,
+                        "ms_per_item": round(1000 * seconds / count, 3) if count else None}
+                for stage, (seconds, count) in self._stages.items()
+            }
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, thread_id=None):
+        """
+        Initializes the SamplingProfiler, which records the call stack of one thread at a fixed interval from a
+        background thread. Unlike cProfile it does not hook every function call, so the profiled code runs at
+        nearly full speed and it can be switched on for a single request in production.
+        Args:
+            interval (float): Seconds between two samples.
+            thread_id (int, optional): Thread to profile (threading.get_ident()). Defaults to the thread calling
+                                       start().
+        """
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()  # Stack (outermost frame first) -> number of samples
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self):
+        """
+        Starts sampling.
+        """
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def collapsed(self):
+        """
+        Returns the samples as collapsed stacks, the input format of flame graph tools (flamegraph.pl, speedscope).
+        Returns:
+            str: One 'outer;...;inner count' line per distinct stack.
+        """
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit=20):
+        """
+        Returns the functions the thread spent the most samples in.
+        Args:
+            limit (int): Number of functions to return.
+        Returns:
+            list: Dictionaries with 'function', 'self' (samples where it was the innermost frame) and
+                  'total' (samples where it was on the stack), sorted by self samples.
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        return [{"function": label, "self": count, "total": total[label]} for label, count in own.most_common(limit)]
@@ -1,7 +1,11 @@
 import json
+import logging
 import csv
 import os
 import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 class ReportGenerator:
     def __init__(self):
@@ -19,7 +23,28 @@ class ReportGenerator:
         """
         with open(output_filepath, 'w') as f:
             json.dump(unique_counts_by_room, f, indent=4)
-        print(f"JSON report saved to {output_filepath}")
+        logger.info("JSON report saved to %s", output_filepath)
+
+    def update_json_report(self, unique_counts_by_room, removed_rooms, output_filepath):
+        """
+        Updates an existing JSON report in place with recomputed counts for some rooms.
+        Rooms that are not part of unique_counts_by_room keep their previous counts.
+        Args:
+            unique_counts_by_room (dict): Recomputed unique object counts for the rooms that changed.
+            removed_rooms (set): Room IDs that no longer have any image and are dropped from the report.
+            output_filepath (str): Path of the JSON report to update. It is created if it does not exist.
+        Returns:
+            dict: The full, updated unique object counts by room.
+        """
+        report = {}
+        if os.path.exists(output_filepath):
+            with open(output_filepath, 'r') as f:
+                report = json.load(f)
+        for room_id in removed_rooms:
+            report.pop(room_id, None)
+        report.update(unique_counts_by_room)
+        self.generate_json_report(report, output_filepath)
+        return report
 
     def generate_csv_report(self, unique_counts_by_room, output_filepath):
         """
@@ -31,24 +56,19 @@ class ReportGenerator:
         with open(output_filepath, 'w', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(["Room ID", "Object", "Count"])
-            for room_id, objects in unique_counts_by_room.items():
-                for obj_name, count in objects.items():
-                    writer.writerow([room_id, obj_name, count])
-        print(f"CSV report saved to {output_filepath}")
+            writer.writerows((room_id, obj_name, count) for room_id, objects in unique_counts_by_room.items()
+                             for obj_name, count in objects.items())
+        logger.info("CSV report saved to %s", output_filepath)
 
-    def visualize_detections(self, image_path, detections, output_path=None):
+    def draw_detections(self, img, detections):
         """
-        Draws bounding boxes and labels on the image and saves or displays it.
+        Draws bounding boxes and labels onto an image in place.
         Args:
-            image_path (str): Path to the input image.
+            img (numpy.ndarray): BGR image to draw on.
             detections (list): List of detected objects.
-            output_path (str, optional): Path to save the output image. If None, displays it.
+        Returns:
+            numpy.ndarray: The annotated image (the same array as img).
         """
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"Error: Could not load image from {image_path}")
-            return
-
         for det in detections:
             x1, y1, x2, y2 = det['box']
             class_name = det['class_name']
@@ -57,10 +77,30 @@ class ReportGenerator:
             color = (0, 255, 0)  # Green color for bounding box
             cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
             cv2.putText(img, f"{class_name} {confidence:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        return img
+
+    def visualize_detections(self, image_path, detections, output_path=None):
+        """
+        Draws bounding boxes and labels on the image and saves or displays it.
+        Args:
+            image_path (str | numpy.ndarray): Path to the input image, or an already decoded BGR image
+                                              (which is copied, not modified).
+            detections (list): List of detected objects.
+            output_path (str, optional): Path to save the output image. If None, displays it.
+        """
+        if isinstance(image_path, np.ndarray):
+            img = image_path.copy()
+        else:
+            img = cv2.imread(image_path)
+            if img is None:
+                logger.error("Could not load image from %s", image_path)
+                return
+
+        self.draw_detections(img, detections)
 
         if output_path:
             cv2.imwrite(output_path, img)
-            print(f"Detection image saved to {output_path}")
+            logger.debug("Detection image saved to %s", output_path)
         else:
             cv2.imshow("Detections", img)
             cv2.waitKey(0)
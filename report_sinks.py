@@ -0,0 +1,369 @@
+import os
+import glob
+import time
+import sqlite3
+import argparse
+import numpy as np
+from detection_result import DetectionResult
+
+SINKS = ("sqlite", "npz", "parquet")
+COLUMNAR_FORMATS = ("npz", "parquet")
+
+def _detection_columns(detections):
+    """
+    Returns the detections of one image as columns, without going through per-detection dictionaries when the
+    detections are a DetectionResult.
+    Args:
+        detections (list | DetectionResult): Detections of the image.
+    Returns:
+        tuple: (class_names, confidences, boxes) as a list, a float32 array and an (N, 4) int32 array.
+    """
+    if isinstance(detections, DetectionResult):
+        return detections.labels, detections.confidences, detections.boxes
+    detections = list(detections)
+    return ([det['class_name'] for det in detections],
+            np.asarray([det['confidence'] for det in detections], dtype=np.float32),
+            np.asarray([det['box'] for det in detections], dtype=np.int32).reshape(-1, 4))
+
+class SqliteReportSink:
+    def __init__(self, db_path, batch_size=1000):
+        """
+        Initializes the SqliteReportSink, which stores per-image detections and per-room counts in a SQLite
+        database so large datasets can be queried (e.g. rooms with more than 2 TVs) without re-running the
+        pipeline or parsing the JSON reports. Images are buffered and written with batched inserts in one
+        transaction per batch. An existing database is updated in place: re-processed sources (images, or videos
+        with all their frames) replace their previous rows, everything else is kept.
+        Args:
+            db_path (str): Path of the database file. It is created if it does not exist.
+            batch_size (int): Number of images buffered before they are written.
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._images = []
+        self._detections = []
+        self._replaced = set()  # Sources whose previous rows were already deleted by this sink
+        self._connection = sqlite3.connect(db_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS images (
+                    image_name TEXT PRIMARY KEY, source_name TEXT, image_path TEXT, room_id TEXT, processed_at REAL);
+                CREATE TABLE IF NOT EXISTS detections (
+                    image_name TEXT, source_name TEXT, room_id TEXT, class_name TEXT, confidence REAL,
+                    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER);
+                CREATE TABLE IF NOT EXISTS room_counts (
+                    room_id TEXT, class_name TEXT, count INTEGER, PRIMARY KEY (room_id, class_name));
+                CREATE INDEX IF NOT EXISTS images_source ON images (source_name);
+                CREATE INDEX IF NOT EXISTS detections_source ON detections (source_name);
+                CREATE INDEX IF NOT EXISTS detections_room ON detections (room_id);
+                CREATE INDEX IF NOT EXISTS detections_class ON detections (class_name, room_id);
+                CREATE INDEX IF NOT EXISTS room_counts_class ON room_counts (class_name, count);
+            """)
+
+    def add(self, image_name, image_path, room_id, detections, source_name=None):
+        """
+        Buffers the detections of a processed image.
+        Args:
+            image_name (str): Name of the image (or video frame).
+            image_path (str): Path to the image (or video) file.
+            room_id (str): Room ID of the image.
+            detections (list | DetectionResult): Detections of the image.
+            source_name (str, optional): Name of the video a frame comes from. Defaults to image_name.
+        """
+        source_name = source_name or image_name
+        class_names, confidences, boxes = _detection_columns(detections)
+        self._images.append((image_name, source_name, image_path, room_id, time.time()))
+        self._detections.extend(
+            (image_name, source_name, room_id, class_name, confidence, *box)
+            for class_name, confidence, box in zip(class_names, confidences.tolist(), boxes.tolist()))
+        if len(self._images) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered images in one transaction.
+        """
+        if not self._images:
+            return
+        # The rows a source had before this run are deleted once, before its first new rows are written
+        replaced = [(name,) for name in dict.fromkeys(image[1] for image in self._images) if name not in self._replaced]
+        self._replaced.update(name for name, in replaced)
+        with self._connection:
+            self._connection.executemany("DELETE FROM detections WHERE source_name = ?", replaced)
+            self._connection.executemany("DELETE FROM images WHERE source_name = ?", replaced)
+            self._connection.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)", self._images)
+            self._connection.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                         self._detections)
+        self._images, self._detections = [], []
+
+    def remove(self, source_names):
+        """
+        Deletes images or videos removed from the dataset, with their detections.
+        Args:
+            source_names (list): Names of the images or videos to delete.
+        """
+        self.flush()
+        names = [(name,) for name in source_names]
+        with self._connection:
+            self._connection.executemany("DELETE FROM detections WHERE source_name = ?", names)
+            self._connection.executemany("DELETE FROM images WHERE source_name = ?", names)
+
+    def write_room_counts(self, counts_by_room, removed_rooms=()):
+        """
+        Stores the object counts of some rooms, replacing their previous counts. Other rooms are kept.
+        Args:
+            counts_by_room (dict): Object counts by room ({room_id: {class_name: count}}).
+            removed_rooms (set): Room IDs whose counts are deleted.
+        """
+        rooms = [(room_id,) for room_id in set(counts_by_room) | set(removed_rooms)]
+        rows = [(room_id, class_name, count) for room_id, objects in counts_by_room.items()
+                for class_name, count in objects.items()]
+        with self._connection:
+            self._connection.executemany("DELETE FROM room_counts WHERE room_id = ?", rooms)
+            self._connection.executemany("INSERT INTO room_counts VALUES (?, ?, ?)", rows)
+
+    def rooms_with(self, class_name, min_count=1):
+        """
+        Finds the rooms holding at least min_count objects of a class, according to the stored room counts.
+        Args:
+            class_name (str): Object class (e.g. 'tv').
+            min_count (int): Minimum count.
+        Returns:
+            dict: Count of the class by room ID.
+        """
+        self.flush()
+        rows = self._connection.execute(
+            "SELECT room_id, count FROM room_counts WHERE class_name = ? AND count >= ? ORDER BY room_id",
+            (class_name, min_count))
+        return dict(rows.fetchall())
+
+    def close(self):
+        """
+        Writes the remaining buffered images and closes the database.
+        """
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ColumnarReportSink:
+    def __init__(self, output_dir, file_format="npz", batch_size=10000):
+        """
+        Initializes the ColumnarReportSink, which stores per-image detections and per-room counts as compressed
+        columnar files (NumPy .npz, or Parquet, which requires the pyarrow package) that load straight into
+        arrays or data frames. Every batch is written to a new part file, so runs only ever add files.
+        Each run has an increasing id stored in every row; read_table(..., latest=True) resolves re-processed
+        and removed sources (images, or videos with all their frames) to their latest state.
+        Args:
+            output_dir (str): Directory of the part files.
+            file_format (str): 'npz' or 'parquet'.
+            batch_size (int): Number of detections buffered before a part file is written.
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown format '{file_format}'. Available formats: {', '.join(COLUMNAR_FORMATS)}")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.run_id = time.time_ns()
+        self._parts = 0
+        self._images = {"image_name": [], "source_name": [], "image_path": [], "room_id": [], "removed": []}
+        self._detections = {"image_name": [], "source_name": [], "room_id": [], "class_name": [], "confidence": [],
+                            "box": []}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _write(self, table, columns):
+        columns = dict(columns, run_id=np.full(len(next(iter(columns.values()))), self.run_id, dtype=np.int64))
+        path = os.path.join(self.output_dir, f"{table}-{self.run_id}-{self._parts:05d}.{self.file_format}")
+        self._parts += 1
+        if self.file_format == "parquet":
+            import pyarrow
+            import pyarrow.parquet
+            columns = {name: (values.tolist() if values.ndim > 1 else values) for name, values in columns.items()}
+            pyarrow.parquet.write_table(pyarrow.table(columns), path)
+        else:
+            np.savez_compressed(path, **columns)
+
+    def add(self, image_name, image_path, room_id, detections, source_name=None):
+        """
+        Buffers the detections of a processed image.
+        Args:
+            image_name (str): Name of the image (or video frame).
+            image_path (str): Path to the image (or video) file.
+            room_id (str): Room ID of the image.
+            detections (list | DetectionResult): Detections of the image.
+            source_name (str, optional): Name of the video a frame comes from. Defaults to image_name.
+        """
+        source_name = source_name or image_name
+        class_names, confidences, boxes = _detection_columns(detections)
+        for name, value in (("image_name", image_name), ("source_name", source_name), ("image_path", image_path),
+                            ("room_id", room_id), ("removed", False)):
+            self._images[name].append(value)
+        self._detections["image_name"].extend([image_name] * len(class_names))
+        self._detections["source_name"].extend([source_name] * len(class_names))
+        self._detections["room_id"].extend([room_id] * len(class_names))
+        self._detections["class_name"].extend(class_names)
+        self._detections["confidence"].append(confidences)
+        self._detections["box"].append(boxes)
+        if len(self._detections["class_name"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered images and detections to new part files.
+        """
+        if not self._images["image_name"]:
+            return
+        self._write("images", {
+            "image_name": np.asarray(self._images["image_name"], dtype=str),
+            "source_name": np.asarray(self._images["source_name"], dtype=str),
+            "image_path": np.asarray(self._images["image_path"], dtype=str),
+            "room_id": np.asarray(self._images["room_id"], dtype=str),
+            "removed": np.asarray(self._images["removed"], dtype=bool)
+        })
+        if self._detections["class_name"]:
+            self._write("detections", {
+                "image_name": np.asarray(self._detections["image_name"], dtype=str),
+                "source_name": np.asarray(self._detections["source_name"], dtype=str),
+                "room_id": np.asarray(self._detections["room_id"], dtype=str),
+                "class_name": np.asarray(self._detections["class_name"], dtype=str),
+                "confidence": np.concatenate(self._detections["confidence"]).astype(np.float32),
+                "box": np.concatenate(self._detections["box"]).astype(np.int32)
+            })
+        for columns in (self._images, self._detections):
+            for values in columns.values():
+                values.clear()
+
+    def remove(self, source_names):
+        """
+        Records that images or videos were removed from the dataset (as rows of the images table marked removed).
+        Args:
+            source_names (list): Names of the removed images or videos.
+        """
+        for source_name in source_names:
+            for name, value in (("image_name", source_name), ("source_name", source_name), ("image_path", ""),
+                                ("room_id", ""), ("removed", True)):
+                self._images[name].append(value)
+        self.flush()
+
+    def write_room_counts(self, counts_by_room, removed_rooms=()):
+        """
+        Stores the object counts of some rooms. Removed rooms are recorded with an empty class name.
+        Args:
+            counts_by_room (dict): Object counts by room ({room_id: {class_name: count}}).
+            removed_rooms (set): Room IDs that no longer have any image.
+        """
+        rows = [(room_id, class_name, count) for room_id, objects in counts_by_room.items()
+                for class_name, count in objects.items()]
+        rows += [(room_id, "", 0) for room_id in removed_rooms]
+        if rows:
+            room_ids, class_names, counts = zip(*rows)
+            self._write("room_counts", {"room_id": np.asarray(room_ids, dtype=str),
+                                        "class_name": np.asarray(class_names, dtype=str),
+                                        "count": np.asarray(counts, dtype=np.int64)})
+
+    def close(self):
+        """
+        Writes the remaining buffered images.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _read_parts(output_dir, table, file_format):
+    parts = []
+    for path in sorted(glob.glob(os.path.join(glob.escape(output_dir), f"{table}-*.{file_format}"))):
+        if file_format == "npz":
+            with np.load(path) as data:
+                parts.append({name: data[name] for name in data.files})
+        else:
+            import pyarrow.parquet
+            data = pyarrow.parquet.read_table(path)
+            parts.append({name: np.asarray(data.column(name).to_pylist()) for name in data.column_names})
+    if not parts:
+        return {}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def read_table(output_dir, table, file_format="npz", latest=True):
+    """
+    Loads a table ('images', 'detections' or 'room_counts') written by ColumnarReportSink.
+    Args:
+        output_dir (str): Directory of the part files.
+        table (str): Table to load.
+        file_format (str): 'npz' or 'parquet'.
+        latest (bool): Only keep the latest state: the rows of the last run that processed each image or video
+                       (dropping removed ones), and the last counts of each room. If False, every row ever written.
+    Returns:
+        dict: Column name -> numpy array (empty if nothing was written).
+    """
+    columns = _read_parts(output_dir, table, file_format)
+    if not latest or not columns:
+        return columns
+    if table == "room_counts":
+        last_run = {}
+        for room_id, run_id in zip(columns["room_id"].tolist(), columns["run_id"].tolist()):
+            last_run[room_id] = max(run_id, last_run.get(room_id, run_id))
+        keep = np.array([last_run[room_id] == run_id and class_name != ""
+                         for room_id, class_name, run_id in zip(columns["room_id"].tolist(),
+                                                                columns["class_name"].tolist(),
+                                                                columns["run_id"].tolist())], dtype=bool)
+    else:
+        images = _read_parts(output_dir, "images", file_format)
+        last_run = {}
+        for name, run_id, removed in zip(images["source_name"].tolist(), images["run_id"].tolist(),
+                                         images["removed"].tolist()):
+            if run_id >= last_run.get(name, (-1, False))[0]:
+                last_run[name] = (run_id, removed)
+        keep = np.array([last_run.get(name) == (run_id, False)
+                         for name, run_id in zip(columns["source_name"].tolist(), columns["run_id"].tolist())],
+                        dtype=bool)
+    return {name: values[keep] for name, values in columns.items()}
+
+def create_sink(sink, output_dir, append=True):
+    """
+    Creates a report sink by name, storing its data under output_dir (in detections.sqlite, or in the columnar
+    directory for the columnar formats).
+    Args:
+        sink (str): One of SINKS ('sqlite', 'npz' or 'parquet').
+        output_dir (str): Output directory of the run.
+        append (bool): Keep the data of previous runs (incremental runs). If False, it is deleted first.
+    Returns:
+        SqliteReportSink | ColumnarReportSink: The sink.
+    Raises:
+        ValueError: If the sink name is unknown.
+    """
+    if sink not in SINKS:
+        raise ValueError(f"Unknown sink '{sink}'. Available sinks: {', '.join(SINKS)}")
+    if sink == "sqlite":
+        db_path = os.path.join(output_dir, "detections.sqlite")
+        if not append:
+            for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+        return SqliteReportSink(db_path)
+    columnar_dir = os.path.join(output_dir, "columnar")
+    if not append:
+        for path in glob.glob(os.path.join(glob.escape(columnar_dir), f"*.{sink}")):
+            os.remove(path)
+    return ColumnarReportSink(columnar_dir, file_format=sink)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query the detection database written with --sink sqlite")
+    parser.add_argument("--db", default="output/detections.sqlite", help="Path of the database")
+    parser.add_argument("--class", dest="class_name", required=True, help="Object class, e.g. tv")
+    parser.add_argument("--min-count", type=int, default=1, help="Minimum count of the class in the room")
+    args = parser.parse_args()
+
+    with SqliteReportSink(args.db) as db:
+        for room_id, count in db.rooms_with(args.class_name, args.min_count).items():
+            print(f"{room_id}: {count}")
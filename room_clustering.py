@@ -0,0 +1,335 @@
+import os
+import json
+import zlib
+import argparse
+from collections import Counter
+import cv2
+import numpy as np
+
+OBJECT_DIMS = 64  # Hashed object-class buckets
+COLOR_BINS = (8, 4, 4)  # Hue, saturation and value bins of the colour histogram
+LAYOUT_SIZE = 8  # Side of the grayscale layout thumbnail
+# Relative weight of the object, colour and layout parts in the cosine similarity of two embeddings
+PART_WEIGHTS = (0.5, 0.35, 0.15)
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def image_embedding(image, detections):
+    """
+    Computes a compact visual embedding of a room photo from the output of the detection pass and the already
+    decoded image, without running a second model. It combines:
+    - what is in the room: a bag of the detected object classes (hashed into OBJECT_DIMS buckets), each
+      weighted by its confidence and the square root of its relative area;
+    - how the room looks: a square-rooted HSV colour histogram of a downscaled copy of the image;
+    - how it is laid out: a mean-centred LAYOUT_SIZE x LAYOUT_SIZE grayscale thumbnail.
+    Every part is L2-normalized and weighted by PART_WEIGHTS, so the dot product of two embeddings is a
+    weighted cosine similarity.
+    Args:
+        image (numpy.ndarray): BGR image.
+        detections (list | DetectionResult): Detections of the image.
+    Returns:
+        numpy.ndarray: The L2-normalized float32 embedding, of length OBJECT_DIMS + prod(COLOR_BINS) + LAYOUT_SIZE**2.
+    """
+    height, width = image.shape[:2]
+    objects = np.zeros(OBJECT_DIMS, dtype=np.float32)
+    for det in detections:
+        x1, y1, x2, y2 = det['box']
+        area = max(0, x2 - x1) * max(0, y2 - y1) / float(width * height)
+        objects[zlib.crc32(det['class_name'].encode()) % OBJECT_DIMS] += det['confidence'] * np.sqrt(area)
+
+    small = cv2.resize(image, (64, 64), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    color = np.sqrt(cv2.calcHist([hsv], [0, 1, 2], None, list(COLOR_BINS), [0, 180, 0, 256, 0, 256]).flatten())
+
+    gray = cv2.resize(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (LAYOUT_SIZE, LAYOUT_SIZE),
+                      interpolation=cv2.INTER_AREA).astype(np.float32).flatten()
+    layout = gray - gray.mean()
+
+    parts = [np.sqrt(weight) * _normalize(part.astype(np.float32))
+             for weight, part in zip(PART_WEIGHTS, (objects, color, layout))]
+    return _normalize(np.concatenate(parts)).astype(np.float32)
+
+class EmbeddingCache:
+    def __init__(self, path=None, max_entries=None):
+        """
+        Initializes the EmbeddingCache, which keeps one image embedding per key (e.g. a file's path, size and
+        modification time, or the hash of uploaded bytes) so images are not embedded again and a dataset can be
+        re-clustered without re-running detection. Embeddings are stored together in one compressed .npz file.
+        Args:
+            path (str, optional): Path of the cache file. It is loaded if it exists. If None, the cache only lives
+                                  in memory.
+            max_entries (int, optional): Maximum number of embeddings kept; the oldest are dropped first.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._embeddings = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                self._embeddings = dict(zip(data['keys'].tolist(), data['embeddings']))
+
+    @staticmethod
+    def file_key(path, suffix=""):
+        """
+        Returns the cache key of an image file (or of a frame of a video file, with a suffix).
+        Args:
+            path (str): Path of the file.
+            suffix (str): Appended to the key, e.g. '@000120' for a video frame.
+        Returns:
+            str: The key, which changes whenever the file is modified.
+        """
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}{suffix}"
+
+    def get(self, key):
+        """
+        Returns the cached embedding of a key, or None.
+        """
+        return self._embeddings.get(key)
+
+    def put(self, key, embedding):
+        """
+        Caches an embedding.
+        """
+        self._embeddings[key] = embedding
+        self._dirty = True
+        while self.max_entries is not None and len(self._embeddings) > self.max_entries:
+            self._embeddings.pop(next(iter(self._embeddings)), None)
+
+    def items(self):
+        """
+        Returns the cached (key, embedding) pairs.
+        """
+        return list(self._embeddings.items())
+
+    def prune(self, prefix, keep):
+        """
+        Drops the embeddings whose key starts with a prefix but is not kept, e.g. those of the files of a dataset
+        that were modified or removed since they were embedded.
+        Args:
+            prefix (str): Key prefix, e.g. the absolute path of a dataset directory.
+            keep (set): Keys to keep.
+        Returns:
+            int: Number of embeddings dropped.
+        """
+        stale = [key for key in list(self._embeddings) if key.startswith(prefix) and key not in keep]
+        for key in stale:
+            self._embeddings.pop(key, None)
+        if stale:
+            self._dirty = True
+        return len(stale)
+
+    def __len__(self):
+        return len(self._embeddings)
+
+    def save(self):
+        """
+        Writes the cache file, if anything changed since it was loaded.
+        """
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        # Snapshot first, as jobs of the web app may add embeddings while the file is written
+        items = list(self._embeddings.items())
+        if not items:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._dirty = False
+            return
+        np.savez_compressed(tmp_path, keys=np.asarray([key for key, _ in items], dtype=str),
+                            embeddings=np.stack([embedding for _, embedding in items]))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+class RoomClusterer:
+    def __init__(self, threshold=0.85, num_tables=32, num_bits=12, refine=True, seed=0):
+        """
+        Initializes the RoomClusterer, which groups image embeddings into rooms with leader clustering: an image
+        joins the most similar existing cluster if their cosine similarity reaches the threshold, and otherwise
+        starts a new one. Candidate clusters are found by approximate nearest-neighbour search with random-hyperplane
+        LSH (an image is only compared with the clusters sharing a hash bucket with it in one of the tables), so the
+        cost grows with the number of images, not with images x clusters.
+        Args:
+            threshold (float): Minimum cosine similarity between an image and a cluster for it to join the cluster.
+            num_tables (int): Number of LSH tables. More tables find more true neighbours at a higher cost.
+            num_bits (int): Hyperplanes per table. More bits make buckets smaller and more selective.
+            refine (bool): After the first pass, reassign every image to the most similar cluster centroid,
+                           which makes the result less dependent on image order.
+            seed (int): Seed of the random hyperplanes.
+        """
+        self.threshold = threshold
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.refine = refine
+        self.seed = seed
+
+    def _signatures(self, embeddings, planes):
+        bits = (embeddings @ planes > 0).reshape(len(embeddings), self.num_tables, self.num_bits)
+        return bits.astype(np.int64) @ (1 << np.arange(self.num_bits, dtype=np.int64))
+
+    def _assign(self, embeddings, signatures, centers, center_signatures, create):
+        # Assigns every embedding to its most similar center among the LSH candidates; with create, embeddings
+        # without a similar enough candidate become new centers
+        tables = [{} for _ in range(self.num_tables)]
+        for index, signature in enumerate(center_signatures):
+            for table, bucket in zip(tables, signature.tolist()):
+                table.setdefault(bucket, []).append(index)
+        centers = list(centers)
+        labels = np.full(len(embeddings), -1, dtype=np.int64)
+        for i, (embedding, signature) in enumerate(zip(embeddings, signatures.tolist())):
+            candidates = {c for table, bucket in zip(tables, signature) for c in table.get(bucket, ())}
+            if candidates:
+                candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                similarities = np.stack([centers[c] for c in candidates]) @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold or not create:
+                    labels[i] = candidates[best]
+                    continue
+            if create:
+                labels[i] = len(centers)
+                centers.append(embedding)
+                for table, bucket in zip(tables, signature):
+                    table.setdefault(bucket, []).append(labels[i])
+        return labels
+
+    def fit(self, embeddings):
+        """
+        Clusters embeddings.
+        Args:
+            embeddings (numpy.ndarray): (N, D) L2-normalized embeddings.
+        Returns:
+            numpy.ndarray: Cluster label of every embedding, numbered 0, 1, ... in order of first appearance.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        if len(embeddings) == 0:
+            return np.zeros(0, dtype=np.int64)
+        planes = np.random.default_rng(self.seed).standard_normal(
+            (embeddings.shape[1], self.num_tables * self.num_bits)).astype(np.float32)
+        signatures = self._signatures(embeddings, planes)
+        labels = self._assign(embeddings, signatures, [], np.zeros((0, self.num_tables), dtype=np.int64), True)
+
+        if self.refine:
+            count = labels.max() + 1
+            centroids = np.zeros((count, embeddings.shape[1]), dtype=np.float32)
+            np.add.at(centroids, labels, embeddings)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+            refined = self._assign(embeddings, signatures, centroids, self._signatures(centroids, planes), False)
+            # Images whose buckets hold no centroid keep their first-pass cluster
+            labels = np.where(refined >= 0, refined, labels)
+
+        # Renumber in order of first appearance, dropping clusters left empty by the refinement
+        _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+        order = np.argsort(np.argsort(first))
+        return order[inverse.reshape(-1)]
+
+def name_clusters(labels, known_room_ids=None, prefix="Room"):
+    """
+    Turns cluster labels into room IDs. A cluster holding images whose room is known (e.g. from metadata) takes
+    the most common of their room IDs; the other clusters are numbered.
+    Args:
+        labels (numpy.ndarray): Cluster label of every image (see RoomClusterer.fit).
+        known_room_ids (list, optional): Known room ID of every image, or None where unknown.
+        prefix (str): Prefix of the numbered room IDs (e.g. 'Room' gives 'Room 1', 'Room 2', ...).
+    Returns:
+        list: The room ID of every image.
+    """
+    known_room_ids = known_room_ids or [None] * len(labels)
+    votes = {}
+    for label, room_id in zip(labels.tolist(), known_room_ids):
+        if room_id:
+            votes.setdefault(label, Counter())[room_id] += 1
+    names = {label: counter.most_common(1)[0][0] for label, counter in votes.items()}
+    taken = set(names.values())
+    number = 0
+    for label in dict.fromkeys(labels.tolist()):
+        if label in names:
+            continue
+        number += 1
+        while f"{prefix} {number}" in taken:
+            number += 1
+        names[label] = f"{prefix} {number}"
+    return [names[label] for label in labels.tolist()]
+
+def cluster_dataset(dataset_path, embedding_cache, threshold=0.85, room_mode="image"):
+    """
+    Assigns the images (and video keyframes) of a dataset to rooms from their cached embeddings, without re-running
+    detection. Only the embeddings of the dataset's current files are used: entries that were never embedded, or
+    whose file changed since, are left out.
+    Args:
+        dataset_path (str): Path to the dataset directory, holding metadata.json or metadata.jsonl.
+        embedding_cache (EmbeddingCache): Cache filled by a run of main.py with room clustering.
+        threshold (float): Minimum cosine similarity between an image and a room for it to join the room.
+        room_mode (str): 'image' or 'auto' (see RoomIdentifier).
+    Returns:
+        tuple: (room_ids, keys, missing) where room_ids maps every clustered image or frame name to its room ID,
+               keys is the set of cache keys used and missing lists the entries without a cached embedding.
+    """
+    from metadata_stream import find_metadata, iter_metadata
+    from room_identifier import RoomIdentifier
+    from video_source import is_video
+
+    metadata_path = find_metadata(dataset_path)
+    if metadata_path is None:
+        raise FileNotFoundError(f"metadata.json not found in {dataset_path}")
+    # Frames of a video are cached under the video's key followed by '@<frame index>'
+    frame_keys = {}
+    for key, _ in embedding_cache.items():
+        base, _, frame = key.rpartition("@")
+        if base and frame.isdigit():
+            frame_keys.setdefault(base, []).append(key)
+
+    room_identifier = RoomIdentifier(mode=room_mode, threshold=threshold)
+    names, keys, known_room_ids, missing = [], [], [], []
+    for image_name, img_metadata in iter_metadata(metadata_path):
+        image_path = os.path.join(dataset_path, image_name)
+        if not os.path.exists(image_path):
+            missing.append(image_name)
+            continue
+        key = EmbeddingCache.file_key(image_path)
+        if is_video(image_name):
+            entry_keys = sorted(frame_keys.get(key, []))
+            entry_names = [image_name + entry_key[len(key):] for entry_key in entry_keys]
+        else:
+            entry_keys = [key] if embedding_cache.get(key) is not None else []
+            entry_names = [image_name]
+        if not entry_keys:
+            missing.append(image_name)
+            continue
+        names.extend(entry_names)
+        keys.extend(entry_keys)
+        known_room_ids.extend([room_identifier.get_room_id(img_metadata)] * len(entry_keys))
+
+    room_ids = room_identifier.assign_rooms([embedding_cache.get(key) for key in keys], known_room_ids)
+    return dict(zip(names, room_ids)), set(keys), missing
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-cluster the images of a dataset into rooms from their cached "
+                                                 "embeddings, without re-running detection")
+    parser.add_argument("--dataset", required=True, help="Dataset directory, holding metadata.json")
+    parser.add_argument("--embeddings", default="detection_cache/room_embeddings.npz", help="Embedding cache file")
+    parser.add_argument("--threshold", type=float, default=0.85, help="Minimum cosine similarity within a room")
+    parser.add_argument("--room-mode", choices=("image", "auto"), default="image",
+                        help="Ignore the metadata room IDs, or keep them and cluster the images without one")
+    parser.add_argument("--output", default="room_assignments.json",
+                        help="JSON file mapping every image (or video keyframe) to its room ID")
+    parser.add_argument("--prune", action="store_true",
+                        help="Drop the cached embeddings of files of the dataset that changed or were removed")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.embeddings)
+    room_ids, keys, missing = cluster_dataset(args.dataset, cache, threshold=args.threshold, room_mode=args.room_mode)
+    with open(args.output, 'w') as f:
+        json.dump(room_ids, f, indent=2)
+    for room_id, count in Counter(room_ids.values()).most_common():
+        print(f"{room_id}: {count} image(s)")
+    if missing:
+        print(f"{len(missing)} entry(ies) have no cached embedding (run main.py with --room-mode first): "
+              f"{', '.join(missing[:10])}{' ...' if len(missing) > 10 else ''}")
+    print(f"Room assignments written to {args.output}")
+    if args.prune:
+        pruned = cache.prune(os.path.join(os.path.abspath(args.dataset), ""), keys)
+        cache.save()
+        print(f"Pruned {pruned} stale embedding(s) from {args.embeddings}")
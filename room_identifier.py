@@ -1,10 +1,34 @@
+import numpy as np
+from room_clustering import RoomClusterer, image_embedding, name_clusters
+
+ROOM_MODES = ("metadata", "image", "auto")
+
 class RoomIdentifier:
-    def __init__(self):
+    def __init__(self, mode="metadata", threshold=0.85, embedding_cache=None):
+        """
+        Initializes the RoomIdentifier. Room IDs come from the image metadata, from the images themselves, or both:
+        images are grouped into rooms by clustering compact embeddings computed from the detection pass
+        (see room_clustering.py), so no scene classification model has to be run.
+        Args:
+            mode (str): 'metadata' (the room ID must be in the metadata), 'image' (every image is assigned to a
+                        room by clustering, ignoring the metadata) or 'auto' (metadata room IDs are kept, images
+                        without one are clustered; clusters holding images with a known room take its ID).
+            threshold (float): Minimum cosine similarity between an image and a room cluster for it to join it.
+            embedding_cache (EmbeddingCache, optional): Cache of the image embeddings, so images are only
+                                                        embedded once.
         """
-        Initializes the RoomIdentifier. Currently, it assumes room ID is provided as metadata.
-        Future enhancements could include a scene classification model.
+        if mode not in ROOM_MODES:
+            raise ValueError(f"Unknown room mode {mode!r}, expected one of {ROOM_MODES}")
+        self.mode = mode
+        self.threshold = threshold
+        self.embedding_cache = embedding_cache
+
+    @property
+    def clusters_images(self):
+        """
+        bool: Whether room IDs are (at least partly) assigned from the images.
         """
-        pass
+        return self.mode != "metadata"
 
     def get_room_id(self, image_metadata):
         """
@@ -14,20 +38,51 @@ class RoomIdentifier:
                                    Expected to have a 'room_id' key.
         Returns:
             str: The room ID.
-            None: If 'room_id' is not found in the metadata.
+            None: If 'room_id' is not found in the metadata, or metadata is ignored in 'image' mode.
         """
+        if self.mode == "image":
+            return None
         return image_metadata.get('room_id')
 
-    # Future enhancement: Method for scene classification
-    # def classify_room_from_image(self, image_path):
-    #     """
-    #     (Placeholder) Classifies the room based on the image content using a scene classification model.
-    #     Args:
-    #         image_path (str): Path to the input image.
-    #     Returns:
-    #         str: The classified room ID.
-    #     """
-    #     pass
+    def embed(self, image, detections, key=None):
+        """
+        Returns the embedding of an image used to cluster it into a room, from the embedding cache if possible.
+        Args:
+            image (numpy.ndarray): BGR image.
+            detections (list | DetectionResult): Detections of the image.
+            key (str, optional): Cache key of the image (see EmbeddingCache.file_key). If None, the cache is
+                                 not used.
+        Returns:
+            numpy.ndarray: The embedding.
+        """
+        if key is not None and self.embedding_cache is not None:
+            embedding = self.embedding_cache.get(key)
+            if embedding is not None:
+                return embedding
+        embedding = image_embedding(image, detections)
+        if key is not None and self.embedding_cache is not None:
+            self.embedding_cache.put(key, embedding)
+        return embedding
+
+    def assign_rooms(self, embeddings, known_room_ids=None):
+        """
+        Assigns a room ID to every image by clustering their embeddings.
+        Args:
+            embeddings (list | numpy.ndarray): Embedding of every image.
+            known_room_ids (list, optional): Room ID of every image from its metadata, or None where unknown.
+                                             Ignored in 'image' mode.
+        Returns:
+            list: The room ID of every image.
+        """
+        if len(embeddings) == 0:
+            return []
+        if self.mode == "image":
+            known_room_ids = None
+        labels = RoomClusterer(threshold=self.threshold).fit(np.stack(embeddings))
+        room_ids = name_clusters(labels, known_room_ids)
+        if known_room_ids is None:
+            return room_ids
+        return [known or room_id for known, room_id in zip(known_room_ids, room_ids)]
 
 if __name__ == '__main__':
     # Example Usage
@@ -0,0 +1,275 @@
+import os
+import zlib
+import logging
+import json
+import time
+import argparse
+import multiprocessing
+from metadata_stream import find_metadata, iter_metadata
+from video_source import KeyframeSampler, frame_name, is_video, iter_video_frames
+from detection_result import DetectionResult
+from room_identifier import RoomIdentifier
+from unique_object_counter import UniqueObjectCounter
+from report_generator import ReportGenerator
+from logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+def _shard_path(shard_dir, shard_index, suffix):
+    return os.path.join(shard_dir, f"shard_{shard_index:04d}{suffix}")
+
+def shard_of(image_name, num_shards):
+    """
+    Returns the shard of an image. It only depends on the image name, so inserting, removing or reordering
+    metadata entries does not move the other images to another shard between resumed runs.
+    Args:
+        image_name (str): Name of the image in the metadata.
+        num_shards (int): Number of shards.
+    Returns:
+        int: The shard index.
+    """
+    return zlib.crc32(image_name.encode()) % num_shards
+
+def _iter_shard_results(results_path):
+    """
+    Streams the partial results of a shard. Once fully consumed, a trailing line left half-written
+    by a crash is truncated from the file.
+    Args:
+        results_path (str): Path of the shard's JSON Lines results file.
+    Yields:
+        dict: The complete result records of the shard, one per image.
+    """
+    if not os.path.exists(results_path):
+        return
+    valid_bytes = 0
+    with open(results_path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            yield record
+    if valid_bytes < os.path.getsize(results_path):
+        with open(results_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+
+def _count_shard_results(results_path, entries):
+    """
+    Rebuilds the unique-object counter of a shard from its results file, using only the records of images that
+    are still in the shard's current entries, counted for their current room. Records of images removed from the
+    metadata or moved to another shard are ignored, and an image whose room changed is counted for its new room.
+    Args:
+        results_path (str): Path of the shard's JSON Lines results file.
+        entries (list): (image_name, image_path, room_id) tuples of the shard.
+    Returns:
+        tuple: (done, unique_counter) where done is the set of image names with a result.
+    """
+    room_ids = {image_name: room_id for image_name, _, room_id in entries}
+    unique_counter = UniqueObjectCounter()
+    done = set()
+    for record in _iter_shard_results(results_path):
+        image_name = record["image_name"]
+        if image_name in room_ids and image_name not in done:
+            done.add(image_name)
+            unique_counter.update(room_ids[image_name], record["detections"])
+    return done, unique_counter
+
+def _run_shard(shard_index, entries, shard_dir, output_dir, batch_size, cache_dir, model_name, threads_per_shard,
+               visualize):
+    """
+    Worker process: detects objects in one shard of the dataset and appends one JSON line per image.
+    Videos are expanded into their keyframes like in main.py; their result line, written once the last keyframe
+    is detected, holds the most confident detection of every class seen in the video. Images already present
+    in the shard's results file (from an earlier, interrupted run) are skipped.
+    When the shard is complete, its partial unique-object counter state is saved for the reduce step.
+    Args:
+        shard_index (int): Index of the shard.
+        entries (list): (image_name, image_path, room_id) tuples of the shard.
+        shard_dir (str): Directory holding the partial shard results.
+        output_dir (str): Output directory; visualizations go to its 'visualizations' subdirectory.
+        batch_size (int): Images per detector forward pass.
+        cache_dir (str, optional): Directory of the persistent detection cache.
+        model_name (str): YOLOv8 model to load.
+        threads_per_shard (int): Number of inference threads the worker may use.
+        visualize (bool): Whether to write annotated images.
+    """
+    import torch
+    from object_detector import ObjectDetector
+    from pipeline import Pipeline
+
+    torch.set_num_threads(threads_per_shard)
+    results_path = _shard_path(shard_dir, shard_index, ".jsonl")
+    stats_path = _shard_path(shard_dir, shard_index, ".stats.json")
+    counts_path = _shard_path(shard_dir, shard_index, ".counts.json")
+    for stale_path in (stats_path, counts_path):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    done, unique_counter = _count_shard_results(results_path, entries)
+    remaining = [entry for entry in entries if entry[0] not in done]
+
+    detector = ObjectDetector(model_name=model_name, cache_dir=cache_dir)
+    pipeline = Pipeline(detector, ReportGenerator(), batch_size=batch_size, decode_workers=2, visualize_workers=1)
+    def visualization_path(filename):
+        return os.path.join(output_dir, "visualizations", filename) if visualize else None
+
+    empty_videos = []  # (video name, room ID) of videos without a readable frame
+
+    def iter_items():
+        for image_name, image_path, room_id in remaining:
+            if not is_video(image_name):
+                yield image_path, visualization_path(f"detected_{image_name}"), image_name, room_id, None
+                continue
+            frames = 0
+            for frame_index, frame in iter_video_frames(image_path, KeyframeSampler()):
+                name = frame_name(image_name, frame_index)
+                yield frame, visualization_path(f"detected_{name}.jpg"), name, room_id, image_name
+                frames += 1
+            if not frames:
+                empty_videos.append((image_name, room_id))
+
+    start = time.perf_counter()
+    with open(results_path, 'a') as f:
+        def write(image_name, room_id, detections):
+            f.write(json.dumps({"image_name": image_name, "room_id": room_id, "detections": list(detections)}) + "\n")
+            f.flush()
+            unique_counter.update(room_id, detections)
+
+        video = None  # [video name, room ID, summary of its keyframes so far] of the video being detected
+        for (_, _, image_name, room_id, video_name), detections in pipeline.run(iter_items()):
+            if video is not None and video[0] != video_name:
+                # Results come in input order, so the previous video has no keyframes left
+                write(*video)
+                video = None
+            if video_name is None:
+                write(image_name, room_id, detections)
+            elif video is None:
+                video = [video_name, room_id, detections.best_per_class()]
+            else:
+                video[2] = DetectionResult.concatenate([video[2], detections], detections.class_names).best_per_class()
+        if video is not None:
+            write(*video)
+        for video_name, room_id in empty_videos:
+            write(video_name, room_id, [])
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        "shard": shard_index,
+        "images": len(remaining),
+        "resumed_images": len(done),
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(len(remaining) / elapsed, 2) if elapsed > 0 else 0.0
+    }
+    with open(counts_path, 'w') as f:
+        json.dump(unique_counter.get_state(), f)
+    with open(stats_path, 'w') as f:
+        json.dump(stats, f)
+
+def run_sharded(dataset_path="sample_dataset", output_dir="output", num_shards=4, batch_size=8,
+                cache_dir="detection_cache", model_name='yolov8n.pt', visualize=True):
+    """
+    Runs the detection pipeline over a large dataset with one worker process per shard, then merges the
+    partial per-shard results and generates the room-wise reports.
+    Each worker loads its own ObjectDetector once. Partial results are appended to output_dir/shards as they
+    are produced, so re-running after a worker crash resumes where every shard stopped.
+    Args:
+        dataset_path (str): Path to the directory containing images and metadata.json (or metadata.jsonl).
+        output_dir (str): Directory to save reports, visualizations and partial shard results.
+        num_shards (int): Number of worker processes.
+        batch_size (int): Images per detector forward pass.
+        cache_dir (str, optional): Directory of the persistent detection cache, shared by all workers.
+        model_name (str): YOLOv8 model each worker loads.
+        visualize (bool): Whether to write annotated images.
+    Returns:
+        dict: Unique object counts by room, or None if some shard did not finish.
+    """
+    metadata_path = find_metadata(dataset_path)
+    if metadata_path is None:
+        logger.error("metadata.json not found in %s", dataset_path)
+        return None
+
+    room_identifier = RoomIdentifier()
+    shards = [[] for _ in range(num_shards)]
+    for image_name, img_metadata in iter_metadata(metadata_path):
+        room_id = room_identifier.get_room_id(img_metadata)
+        if not room_id:
+            logger.warning("No room ID found for %s. Skipping.", image_name)
+            continue
+        shards[shard_of(image_name, num_shards)].append((image_name, os.path.join(dataset_path, image_name), room_id))
+
+    shard_dir = os.path.join(output_dir, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "visualizations"), exist_ok=True)
+
+    # 1. Map: one detector process per unfinished shard
+    threads_per_shard = max(1, (os.cpu_count() or 1) // num_shards)
+    workers = {}
+    complete = {}  # shard index -> counter of an already complete shard
+    for shard_index, entries in enumerate(shards):
+        results_path = _shard_path(shard_dir, shard_index, ".jsonl")
+        done, partial = _count_shard_results(results_path, entries)
+        if all(image_name in done for image_name, _, _ in entries):
+            logger.info("Shard %d: already complete, skipping.", shard_index)
+            complete[shard_index] = partial
+            continue
+        worker = multiprocessing.Process(
+            target=_run_shard,
+            args=(shard_index, entries, shard_dir, output_dir, batch_size, cache_dir, model_name, threads_per_shard,
+                  visualize))
+        worker.start()
+        workers[shard_index] = worker
+
+    failed = []
+    for shard_index, worker in workers.items():
+        worker.join()
+        if worker.exitcode != 0:
+            failed.append(shard_index)
+
+    for shard_index in range(num_shards):
+        stats_path = _shard_path(shard_dir, shard_index, ".stats.json")
+        if shard_index in workers and os.path.exists(stats_path):
+            with open(stats_path, 'r') as f:
+                stats = json.load(f)
+            logger.info("Shard %d: %d image(s) in %ss (%s images/sec, %d resumed)", shard_index, stats['images'],
+                        stats['seconds'], stats['images_per_sec'], stats['resumed_images'])
+
+    if failed:
+        logger.error("Shard(s) %s did not finish. Re-run with the same arguments to resume.", failed)
+        return None
+
+    # 2. Reduce: merge the partial unique-object counters of all shards. Counters saved by an earlier run may
+    # include images since removed or moved, so only the ones the workers of this run saved are reused
+    unique_counter = UniqueObjectCounter()
+    for shard_index, entries in enumerate(shards):
+        counts_path = _shard_path(shard_dir, shard_index, ".counts.json")
+        if shard_index in complete:
+            partial = complete[shard_index]
+        elif os.path.exists(counts_path):
+            with open(counts_path, 'r') as f:
+                partial = UniqueObjectCounter.from_state(json.load(f))
+        else:
+            # The worker stopped after its last result but before saving its counter: rebuild it from the results
+            _, partial = _count_shard_results(_shard_path(shard_dir, shard_index, ".jsonl"), entries)
+        unique_counter.merge(partial)
+
+    unique_counts = unique_counter.snapshot()
+    report_generator = ReportGenerator()
+    report_generator.generate_json_report(unique_counts, os.path.join(output_dir, "room_wise_report.json"))
+    report_generator.generate_csv_report(unique_counts, os.path.join(output_dir, "room_wise_report.csv"))
+    return unique_counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sharded multi-process room-wise unique object detection")
+    parser.add_argument("--dataset", default="sample_dataset", help="Directory containing images and metadata.json")
+    parser.add_argument("--output", default="output", help="Directory for reports, visualizations and shard results")
+    parser.add_argument("--shards", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per detector forward pass")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLOv8 model loaded by every worker")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent detection cache")
+    parser.add_argument("--no-visualizations", action="store_true", help="Do not write annotated images")
+    args = parser.parse_args()
+    configure_logging()
+
+    run_sharded(dataset_path=args.dataset, output_dir=args.output, num_shards=args.shards, batch_size=args.batch_size,
+                cache_dir=None if args.no_cache else "detection_cache", model_name=args.model,
+                visualize=not args.no_visualizations)
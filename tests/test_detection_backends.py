@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import check_backend_parity, make_random_images
+
+def _installed(*modules):
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+class BackendParityTest(unittest.TestCase):
+    """
+    Exported backends must report the same detections as the PyTorch backend: same class, box IoU >= 0.9 and
+    confidence within 1e-5. The model has random weights (no download needed), so the confidence threshold is very
+    low to get detections at all. The images share one size: ultralytics pads batches of mixed sizes to a square,
+    which the exported backends do not reproduce.
+    """
+    @classmethod
+    def setUpClass(cls):
+        from ultralytics import YOLO
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.model_path = os.path.join(cls.tmp_dir, "random_yolov8n.pt")
+        YOLO("yolov8n.yaml").save(cls.model_path)
+        cls.images = make_random_images(4)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def check_parity(self, backend):
+        results = check_backend_parity(self.model_path, self.images, backend=backend, conf=1e-5,
+                                       export_dir=os.path.join(self.tmp_dir, "exported_models"))
+        self.assertGreater(results["reference_detections"], 0)
+        self.assertEqual(results["candidate_detections"], results["reference_detections"])
+        self.assertEqual(results["matched"], results["reference_detections"])
+
+    @unittest.skipUnless(_installed("onnx", "onnxruntime"), "onnx and onnxruntime are not installed")
+    def test_onnx_parity(self):
+        self.check_parity("onnx")
+
+    @unittest.skipUnless(_installed("openvino"), "openvino is not installed")
+    def test_openvino_parity(self):
+        self.check_parity("openvino")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import math
+import numpy as np
+
+INFERENCE_MODES = ("full", "tiled", "adaptive")
+
+def _tile_starts(length, tile, overlap):
+    """
+    Returns the start offsets of tiles of size tile covering [0, length) with at least overlap pixels of overlap.
+    """
+    if length <= tile:
+        return [0]
+    count = math.ceil((length - overlap) / (tile - overlap))
+    return [round(start) for start in np.linspace(0, length - tile, count)]
+
+def plan_inference(height, width, imgsz=640, mode="full", tile_overlap=0.2, max_tiles=16, tile_threshold=2.0,
+                   min_imgsz=320, stride=32):
+    """
+    Decides how an image is run through the detector.
+    - 'full': the whole image at imgsz (the default behaviour).
+    - 'tiled': images larger than imgsz are split into overlapping tiles of about imgsz pixels, each run at imgsz
+      (so small objects keep their native resolution), plus one pass over the whole image for large objects.
+    - 'adaptive': images smaller than imgsz run at their own size (rounded up to the stride, at least min_imgsz)
+      instead of being upscaled; images up to tile_threshold * imgsz run at imgsz; larger ones (e.g. panoramas)
+      are tiled as in 'tiled'.
+    More tiles (smaller tile_threshold, larger max_tiles) find more small objects at the cost of throughput.
+    Args:
+        height (int): Image height.
+        width (int): Image width.
+        imgsz (int): Default inference size.
+        mode (str): One of INFERENCE_MODES.
+        tile_overlap (float): Overlap between neighbouring tiles, as a fraction of the tile size.
+        max_tiles (int): Maximum number of tiles per image; tiles grow beyond imgsz pixels to respect it.
+        tile_threshold (float): In 'adaptive' mode, images are tiled when their longest side exceeds
+                                tile_threshold * imgsz.
+        min_imgsz (int): Smallest inference size used for small images in 'adaptive' mode.
+        stride (int): Model stride; inference sizes are rounded up to a multiple of it.
+    Returns:
+        tuple: (input_size, regions) where regions is a list of (x1, y1, x2, y2) crops to run at input_size.
+               The first region is the whole image when a global pass is included.
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode '{mode}'. Available modes: {', '.join(INFERENCE_MODES)}")
+    longest = max(height, width)
+    whole = [(0, 0, width, height)]
+    if mode == "full":
+        return imgsz, whole
+    if mode == "adaptive":
+        if longest <= imgsz:
+            return max(min_imgsz, math.ceil(longest / stride) * stride), whole
+        if longest <= tile_threshold * imgsz:
+            return imgsz, whole
+    elif longest <= imgsz:
+        return imgsz, whole
+
+    # Grow the tiles until the grid fits in max_tiles
+    tile = imgsz
+    while True:
+        overlap = round(tile * tile_overlap)
+        xs, ys = _tile_starts(width, tile, overlap), _tile_starts(height, tile, overlap)
+        if len(xs) * len(ys) <= max_tiles:
+            break
+        tile = round(tile * 1.25)
+    tiles = [(x, y, min(x + tile, width), min(y + tile, height)) for y in ys for x in xs]
+    return imgsz, whole + tiles
+
+def merge_detections(arrays, iou_threshold=0.5, ios_threshold=0.8):
+    """
+    Merges detections from overlapping regions of one image with class-aware NMS.
+    Besides IoU, a box is also suppressed when most of it lies inside a more confident box of the same class
+    (intersection over the smaller box), which removes partial detections of objects cut at tile borders.
+    Args:
+        arrays (list): (N, 6) arrays of [x1, y1, x2, y2, confidence, class_id] in image coordinates.
+        iou_threshold (float): IoU above which the less confident box is suppressed.
+        ios_threshold (float): Intersection over the smaller box above which the less confident box is suppressed.
+    Returns:
+        numpy.ndarray: The merged (N, 6) detections, most confident first.
+    """
+    data = np.concatenate([np.asarray(a, dtype=np.float32).reshape(-1, 6) for a in arrays])
+    if len(data) == 0:
+        return data
+    data = data[np.argsort(-data[:, 4], kind="stable")]
+    boxes, class_ids = data[:, :4], data[:, 5]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(len(data), dtype=bool)
+    keep = []
+    for i in range(len(data)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        rest = np.flatnonzero(~suppressed[i + 1:] & (class_ids[i + 1:] == class_ids[i])) + i + 1
+        if len(rest) == 0:
+            continue
+        ix = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        iy = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        intersection = ix * iy
+        iou = intersection / np.maximum(areas[i] + areas[rest] - intersection, 1e-9)
+        ios = intersection / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        suppressed[rest[(iou > iou_threshold) | (ios > ios_threshold)]] = True
+    return data[keep]
@@ -1,11 +1,103 @@
 from collections import defaultdict
+import numpy as np
+from detection_result import DetectionResult
 
 class UniqueObjectCounter:
-    def __init__(self):
+    def __init__(self, class_names=None):
         """
         Initializes the UniqueObjectCounter.
+        Besides the one-shot count_unique_objects, the counter can be fed incrementally with update().
+        Its per-room state is a bitset over the class vocabulary, so memory grows with the number of rooms,
+        not with the number of detections.
+        Args:
+            class_names (dict | list, optional): Class vocabulary (class id -> class name), e.g. the detector's
+                                                 class names. Unknown class names are added when first seen.
+        """
+        self._class_names = []  # bit index -> class name
+        self._class_index = {}  # class name -> bit index
+        self._room_bits = {}  # room ID -> bitset of classes present in the room
+        if class_names:
+            names = class_names.values() if isinstance(class_names, dict) else class_names
+            for class_name in names:
+                self._index(class_name)
+
+    def _index(self, class_name):
+        index = self._class_index.get(class_name)
+        if index is None:
+            index = self._class_index[class_name] = len(self._class_names)
+            self._class_names.append(class_name)
+        return index
+
+    def update(self, room_id, detections):
+        """
+        Adds the detections of one image to the running per-room state.
+        Args:
+            room_id (str): Room the image belongs to.
+            detections (list | DetectionResult): Detections of the image. Each detection is expected to be a
+                                                 dictionary with at least a 'class_name' key.
+        """
+        if isinstance(detections, DetectionResult):
+            class_names = [detections.class_names[class_id] for class_id in np.unique(detections.class_ids).tolist()]
+        else:
+            class_names = {det['class_name'] for det in detections}
+
+        bits = self._room_bits.get(room_id, 0)
+        for class_name in class_names:
+            bits |= 1 << self._index(class_name)
+        self._room_bits[room_id] = bits
+
+    def merge(self, other):
+        """
+        Merges the state of another counter (e.g. a partial counter from a different worker) into this one.
+        Args:
+            other (UniqueObjectCounter): The counter to merge.
+        Returns:
+            UniqueObjectCounter: This counter.
+        """
+        if other._class_names == self._class_names[:len(other._class_names)]:
+            remap = None  # Same bit layout, bitsets can be OR-ed directly
+        else:
+            remap = [self._index(class_name) for class_name in other._class_names]
+
+        for room_id, other_bits in other._room_bits.items():
+            if remap is not None:
+                other_bits = sum(1 << remap[i] for i in range(len(remap)) if other_bits >> i & 1)
+            self._room_bits[room_id] = self._room_bits.get(room_id, 0) | other_bits
+        return self
+
+    def snapshot(self):
+        """
+        Returns the current unique object counts without rescanning any detections.
+        Returns:
+            dict: A dictionary where keys are room IDs and values are dictionaries of unique object counts,
+                  in the same format as count_unique_objects.
+        """
+        return {
+            room_id: {class_name: 1 for i, class_name in enumerate(self._class_names) if bits >> i & 1}
+            for room_id, bits in self._room_bits.items()
+        }
+
+    def get_state(self):
+        """
+        Returns the counter state in a JSON-serializable form, so partial counters can be saved or sent
+        between processes.
+        Returns:
+            dict: The class vocabulary and the per-room bitsets.
+        """
+        return {"class_names": list(self._class_names), "rooms": dict(self._room_bits)}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores a counter saved with get_state.
+        Args:
+            state (dict): State returned by get_state.
+        Returns:
+            UniqueObjectCounter: The restored counter.
         """
-        pass
+        counter = cls(state["class_names"])
+        counter._room_bits = {room_id: int(bits) for room_id, bits in state["rooms"].items()}
+        return counter
 
     def count_unique_objects(self, detections_by_room):
         """
@@ -0,0 +1,117 @@
+import os
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm', 'm4v'}
+
+def is_video(filename):
+    """
+    Tells whether a file is a video, from its extension.
+    Args:
+        filename (str): File name or path.
+    Returns:
+        bool: True for video files.
+    """
+    return os.path.splitext(filename)[1].lower().lstrip('.') in VIDEO_EXTENSIONS
+
+def frame_name(video_name, frame_index):
+    """
+    Returns the name under which a frame of a video is reported (e.g. in detections.jsonl).
+    Args:
+        video_name (str): Name of the video file.
+        frame_index (int): Index of the frame in the video.
+    Returns:
+        str: The frame name, e.g. 'walkthrough.mp4@000120'.
+    """
+    return f"{video_name}@{frame_index:06d}"
+
+class KeyframeSampler:
+    def __init__(self, hash_size=8, min_distance=10, min_gap=0, max_gap=None):
+        """
+        Initializes the KeyframeSampler, which drops near-duplicate frames of a video before inference.
+        Every frame is reduced to a difference hash (dHash: the sign of horizontal gradients of a tiny grayscale
+        thumbnail), and a frame is kept only when its hash differs enough from the last kept frame.
+        Args:
+            hash_size (int): Side of the hash grid; the hash has hash_size * hash_size bits.
+            min_distance (int): Minimum Hamming distance to the last kept frame for a frame to be kept.
+            min_gap (int): Minimum number of frames between two kept frames.
+            max_gap (int, optional): A frame is always kept after this many frames without a keyframe,
+                                     so slow pans are still sampled.
+        """
+        self.hash_size = hash_size
+        self.min_distance = min_distance
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self._last_hash = None
+        self._last_index = None
+
+    def dhash(self, frame):
+        """
+        Computes the difference hash of a frame.
+        Args:
+            frame (numpy.ndarray): BGR frame.
+        Returns:
+            numpy.ndarray: Boolean array of hash_size * hash_size bits.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+        return (small[:, 1:] > small[:, :-1]).reshape(-1)
+
+    def accept(self, frame, frame_index):
+        """
+        Decides whether a frame is kept, and remembers it as the last keyframe if so.
+        Args:
+            frame (numpy.ndarray): BGR frame.
+            frame_index (int): Index of the frame in the video.
+        Returns:
+            bool: True if the frame should be run through the detector.
+        """
+        if self._last_index is not None and frame_index - self._last_index < self.min_gap:
+            return False
+        frame_hash = self.dhash(frame)
+        keep = (self._last_hash is None
+                or int(np.count_nonzero(frame_hash != self._last_hash)) >= self.min_distance
+                or (self.max_gap is not None and frame_index - self._last_index >= self.max_gap))
+        if keep:
+            self._last_hash = frame_hash
+            self._last_index = frame_index
+        return keep
+
+def iter_video_frames(video_path, sampler=None, frame_step=1):
+    """
+    Streams the frames of a video with OpenCV, without extracting them to disk.
+    Args:
+        video_path (str): Path to the video file.
+        sampler (KeyframeSampler, optional): Keyframe filter; near-duplicate frames are skipped before inference.
+                                             If None, every frame_step-th frame is yielded.
+        frame_step (int): Only every frame_step-th frame is considered; the others are skipped without being
+                          converted to an image.
+    Yields:
+        tuple: (frame_index, frame) for every kept frame, where frame is a BGR numpy array.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        logger.error("Could not open video %s", video_path)
+        return
+    kept = total = 0
+    try:
+        frame_index = -1
+        while True:
+            frame_index += 1
+            if frame_index % frame_step:
+                if not capture.grab():
+                    break
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                break
+            total += 1
+            if sampler is None or sampler.accept(frame, frame_index):
+                kept += 1
+                yield frame_index, frame
+    finally:
+        capture.release()
+        logger.info("Video %s: kept %d of %d sampled frame(s)", video_path, kept, total)
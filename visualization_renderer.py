@@ -0,0 +1,183 @@
+import os
+import logging
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+import cv2
+from report_generator import ReportGenerator
+from video_source import is_video
+from profiling import StageTimer
+from logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+class VisualizationRenderer:
+    def __init__(self, report_generator=None, max_bytes=64 * 1024 * 1024, jpeg_quality=90, timer=None):
+        """
+        Initializes the VisualizationRenderer, which draws annotated images on demand instead of for every
+        processed image, and keeps the encoded results in a bounded in-memory LRU cache.
+        Every rendering is identified by an ETag derived from the source image (path, size, modification time),
+        the detections and the thumbnail size, so clients can revalidate without anything being rendered.
+        Args:
+            report_generator (ReportGenerator, optional): Used to draw the detections. A new one is created if None.
+            max_bytes (int): Maximum total size of the encoded images kept in the cache.
+            jpeg_quality (int): JPEG quality used for thumbnails and JPEG sources.
+            timer (StageTimer, optional): Collects the time spent in the 'decode', 'draw' and 'encode' stages of
+                                          renderings. A new one is created if None.
+        """
+        self.report_generator = report_generator or ReportGenerator()
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self._cache = OrderedDict()  # ETag -> (encoded bytes, mimetype)
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.timer = timer or StageTimer()
+
+    @staticmethod
+    def _format(image_path, size):
+        ext = os.path.splitext(image_path)[1].lower()
+        if size is None and ext == '.png':
+            return '.png', 'image/png'
+        # Thumbnails and formats OpenCV cannot write (e.g. GIF) are always encoded as JPEG
+        return '.jpg', 'image/jpeg'
+
+    def validator(self, image_path, detections, size=None):
+        """
+        Computes the cache validators of a rendering without rendering it.
+        Args:
+            image_path (str): Path to the source image.
+            detections (list): Detections to draw.
+            size (int, optional): Longest side of the thumbnail, or None for the full-size image.
+        Returns:
+            tuple: (etag, last_modified) where last_modified is the source image's modification time in seconds,
+                   or None if the source image does not exist.
+        """
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        digest = hashlib.sha1()
+        digest.update(f"{os.path.abspath(image_path)}:{stat.st_size}:{stat.st_mtime_ns}:{size}".encode())
+        digest.update(json.dumps(list(detections), sort_keys=True).encode())
+        return digest.hexdigest(), stat.st_mtime
+
+    def render(self, image_path, detections, size=None):
+        """
+        Returns an annotated (and optionally downscaled) image, from the cache if it was rendered before.
+        Args:
+            image_path (str): Path to the source image.
+            detections (list): Detections to draw.
+            size (int, optional): Longest side of the thumbnail, or None for the full-size image.
+        Returns:
+            tuple: (data, mimetype, etag, last_modified), or None if the source image cannot be read.
+        """
+        validators = self.validator(image_path, detections, size)
+        if validators is None:
+            logger.error("Could not load image from %s", image_path)
+            return None
+        etag, last_modified = validators
+
+        with self._lock:
+            entry = self._cache.get(etag)
+            if entry is not None:
+                self._cache.move_to_end(etag)
+                self.hits += 1
+                return entry[0], entry[1], etag, last_modified
+            self.misses += 1
+
+        with self.timer.stage("decode"):
+            img = cv2.imread(image_path)
+        if img is None:
+            logger.error("Could not load image from %s", image_path)
+            return None
+        with self.timer.stage("draw"):
+            self.report_generator.draw_detections(img, detections)
+        if size is not None:
+            scale = size / max(img.shape[:2])
+            if scale < 1:
+                img = cv2.resize(img, (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale))),
+                                 interpolation=cv2.INTER_AREA)
+        ext, mimetype = self._format(image_path, size)
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality] if ext == '.jpg' else []
+        with self.timer.stage("encode"):
+            ok, encoded = cv2.imencode(ext, img, params)
+        if not ok:
+            logger.error("Could not encode visualization of %s", image_path)
+            return None
+        data = encoded.tobytes()
+
+        with self._lock:
+            if etag not in self._cache and len(data) <= self.max_bytes:
+                self._cache[etag] = (data, mimetype)
+                self._cache_bytes += len(data)
+                while self._cache_bytes > self.max_bytes:
+                    _, (evicted, _) = self._cache.popitem(last=False)
+                    self._cache_bytes -= len(evicted)
+        return data, mimetype, etag, last_modified
+
+    def export(self, records, output_dir, size=None):
+        """
+        Renders visualizations to files, e.g. for the images of a batch run made without visualizations.
+        Args:
+            records (iterable): Dictionaries with 'image_name', 'image_path' and 'detections' keys
+                                (the format of detections.jsonl). Video frames are skipped: the batch pipeline
+                                draws them when they are processed, since it stores no image to render them from.
+            output_dir (str): Directory the visualizations are written to, as detected_<image_name>.
+            size (int, optional): Longest side of thumbnails to write instead of full-size images.
+        Returns:
+            int: The number of visualizations written.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        written = 0
+        for record in records:
+            if is_video(record["image_path"]):
+                continue
+            rendered = self.render(record["image_path"], record["detections"], size)
+            if rendered is None:
+                continue
+            name, ext = os.path.splitext(record["image_name"])
+            if size is not None or ext.lower() not in ('.jpg', '.jpeg', '.png'):
+                ext = '.jpg'
+            with open(os.path.join(output_dir, f"detected_{name}{ext}"), 'wb') as f:
+                f.write(rendered[0])
+            written += 1
+        logger.info("Exported %d visualization(s) to %s", written, output_dir)
+        return written
+
+    def stats(self):
+        """
+        Returns render cache statistics.
+        Returns:
+            dict: Cache hits, misses, number of cached renderings and their total size in bytes.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache),
+                    "bytes": self._cache_bytes}
+
+def iter_detection_records(detections_path):
+    """
+    Reads the raw per-image detections written by the batch pipeline.
+    Args:
+        detections_path (str): Path to detections.jsonl.
+    Yields:
+        dict: One record per image.
+    """
+    with open(detections_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render visualizations from the detections of a previous run")
+    parser.add_argument("--detections", default="output/detections.jsonl", help="Raw detections of the run")
+    parser.add_argument("--output", default="output/visualizations", help="Directory for the rendered images")
+    parser.add_argument("--size", type=int, default=None, help="Longest side of thumbnails (default: full size)")
+    args = parser.parse_args()
+    configure_logging()
+
+    # Each image is rendered once, so there is nothing to gain from caching the encoded results
+    VisualizationRenderer(max_bytes=0).export(iter_detection_records(args.detections), args.output, size=args.size)
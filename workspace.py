@@ -0,0 +1,185 @@
+import os
+import logging
+import re
+import time
+import uuid
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID = re.compile(r'^[0-9a-f]{32}$')
+BUSY_FILE = "busy"  # Marks a workspace in use by a job; holds the PID of the process running it
+
+class Workspace:
+    def __init__(self, session_id, root):
+        """
+        Initializes a Workspace, the private directory tree of one upload session.
+        Args:
+            session_id (str): The session identifier.
+            root (str): Root directory of the workspace.
+        """
+        self.session_id = session_id
+        self.root = root
+        self.upload_dir = os.path.join(root, "uploads")
+        self.visualization_dir = os.path.join(root, "visualizations")
+        self.report_dir = os.path.join(root, "reports")
+
+    def touch(self):
+        """
+        Marks the workspace as recently used. The last access time is the modification time of the workspace
+        directory, so it is shared by every worker process serving the same directory.
+        """
+        try:
+            os.utime(self.root)
+        except OSError:
+            pass
+
+    def mark_busy(self):
+        """
+        Marks the workspace as in use (e.g. by a queued or running job), so that the sweeper of no worker process
+        removes it. The marker holds the PID of this process, so it no longer counts once the process is gone.
+        """
+        with open(os.path.join(self.root, BUSY_FILE), 'w') as f:
+            f.write(str(os.getpid()))
+
+    def mark_idle(self):
+        """
+        Removes the busy marker of the workspace.
+        """
+        try:
+            os.remove(os.path.join(self.root, BUSY_FILE))
+        except FileNotFoundError:
+            pass
+
+    def is_busy(self):
+        """
+        Tells whether the workspace is marked as in use by a process that is still alive.
+        Returns:
+            bool: True if the workspace is busy.
+        """
+        try:
+            with open(os.path.join(self.root, BUSY_FILE), 'r') as f:
+                pid = int(f.read())
+        except (OSError, ValueError):
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+class WorkspaceManager:
+    def __init__(self, root, ttl_seconds=3600, max_bytes=2 * 1024 * 1024 * 1024, is_busy=None):
+        """
+        Initializes the WorkspaceManager, which hands out per-session workspaces and evicts old ones.
+        All state lives on disk, so several worker processes can share the same root safely.
+        Args:
+            root (str): Directory under which workspaces are created.
+            ttl_seconds (int): Workspaces not accessed for this long are removed by the sweeper.
+            max_bytes (int): Disk quota for all workspaces; least recently used workspaces are removed beyond it.
+            is_busy (callable, optional): Called with a session ID; workspaces for which it returns True are never
+                                          evicted, like those marked busy on disk (see Workspace.mark_busy).
+        """
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.is_busy = is_busy or (lambda session_id: False)
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, busy=False):
+        """
+        Creates a new, empty workspace.
+        Args:
+            busy (bool): Mark the workspace as in use right away (see Workspace.mark_busy), e.g. for the job
+                         about to fill it.
+        Returns:
+            Workspace: The new workspace.
+        """
+        workspace = self.get(uuid.uuid4().hex)
+        os.makedirs(workspace.root, exist_ok=True)
+        if busy:
+            workspace.mark_busy()
+        for directory in (workspace.upload_dir, workspace.visualization_dir, workspace.report_dir):
+            os.makedirs(directory, exist_ok=True)
+        return workspace
+
+    def get(self, session_id):
+        """
+        Returns the workspace of a session without touching the filesystem.
+        Args:
+            session_id (str): The session identifier.
+        Returns:
+            Workspace: The workspace, or None if session_id is not a valid session identifier.
+        """
+        if not _SESSION_ID.match(session_id):
+            return None
+        return Workspace(session_id, os.path.join(self.root, session_id))
+
+    def sweep(self):
+        """
+        Removes workspaces whose last access is older than the TTL, then the least recently used ones
+        until the total size is within the disk quota. Busy workspaces are skipped, including those marked busy by
+        other worker processes.
+        Returns:
+            int: The number of workspaces removed.
+        """
+        now = time.time()
+        workspaces = []
+        for session_id in os.listdir(self.root):
+            path = os.path.join(self.root, session_id)
+            if not _SESSION_ID.match(session_id) or not os.path.isdir(path):
+                continue
+            try:
+                last_access = os.stat(path).st_mtime
+            except OSError:
+                continue
+            workspaces.append((last_access, session_id, path, self._size(path)))
+
+        removed = 0
+        total_bytes = sum(size for _, _, _, size in workspaces)
+        for last_access, session_id, path, size in sorted(workspaces):
+            expired = now - last_access > self.ttl_seconds
+            if not (expired or total_bytes > self.max_bytes):
+                continue
+            if self.is_busy(session_id) or self.get(session_id).is_busy():
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total_bytes -= size
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _size(path):
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+
+    def start_sweeper(self, interval_seconds=60):
+        """
+        Starts a background thread that calls sweep() periodically.
+        Args:
+            interval_seconds (int): Time between two sweeps.
+        Returns:
+            threading.Thread: The sweeper thread (a daemon).
+        """
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        logger.info("Workspace sweeper removed %d workspace(s)", removed)
+                except Exception as e:
+                    logger.exception("Workspace sweep failed: %s", e)
+
+        thread = threading.Thread(target=loop, name="workspace-sweeper", daemon=True)
+        thread.start()
+        return thread